@@ -86,6 +86,12 @@ public:
         QueryResponse* response,
         std::function<void(grpc::Status)> callback);
     
+    // Handles a QueryDataBatch RPC call
+    void HandleQueryDataBatch(
+        grpc::ServerContext* context,
+        grpc::ServerReaderWriter<QueryResponse, QueryRequest>* stream,
+        std::function<void(grpc::Status)> callback);
+    
     // Handles a GatherData RPC call
     void HandleGatherData(
         grpc::ServerContext* context,
@@ -8,56 +8,163 @@ and setting up the Python client.
 """
 
 import argparse
+import hashlib
 import os
+import shutil
 import subprocess
 import sys
+import threading
 import platform
+import pathlib
 
+# The project root directory
+_PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
 
-def run_command(command, cwd=None):
-    """Run a command and print its output."""
-    print(f"Running: {' '.join(command)}")
-    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+# Persistent pip and ccache caches, reused across builds and CI runs
+_CACHE_DIR = _PROJECT_ROOT / ".cache"
+_PIP_CACHE_DIR = _CACHE_DIR / "pip"
+_CCACHE_DIR = _CACHE_DIR / "ccache"
 
-    if result.stdout:
-        print(result.stdout)
+# Custom FindProtobuf.cmake written into the build directory for MSYS2/MinGW
+_FIND_PROTOBUF_TEMPLATE = """
+# Custom FindProtobuf.cmake to avoid target conflicts
+set(Protobuf_FOUND TRUE)
+set(Protobuf_INCLUDE_DIR "C:/msys64/ucrt64/include")
+set(Protobuf_LIBRARIES "C:/msys64/ucrt64/lib/libprotobuf.dll.a")
+set(Protobuf_PROTOC_EXECUTABLE "C:/msys64/ucrt64/bin/protoc.exe")
+set(Protobuf_VERSION "5.28.3")
+"""
 
-    if result.stderr:
-        print(result.stderr)
 
-    if result.returncode != 0:
-        print(f"Command failed with exit code {result.returncode}")
-        sys.exit(result.returncode)
+def default_env():
+    """Get the environment for build commands, with persistent cache settings.
+
+    Values already set in the environment take precedence.
+    """
+    env = os.environ.copy()
+    env.setdefault("PIP_CACHE_DIR", str(_PIP_CACHE_DIR))
+    env.setdefault("CCACHE_DIR", str(_CCACHE_DIR))
+    env.setdefault("CMAKE_BUILD_PARALLEL_LEVEL", str(_available_cores()))
+    return env
+
+
+def popen_command(command, cwd=None, env=None, capture=True):
+    """Start a command without waiting for it to finish.
+
+    If capture is False, the command writes directly to this script's
+    stdout/stderr instead of having its output buffered in memory.
+    """
+    print(f"Running: {' '.join(command)}", flush=True)
+    if env is None:
+        env = default_env()
+    output = subprocess.PIPE if capture else None
+    return subprocess.Popen(
+        command,
+        cwd=cwd,
+        env=env,
+        stdout=output,
+        stderr=output,
+        text=True,
+    )
 
 
-def build_cpp_components(build_dir, build_type, clean, skip_tests=False):
-    """Build the C++ components of the project."""
-    # Get the project root directory
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+def wait_command(process):
+    """Wait for a command started with popen_command and print its output."""
+    stdout, stderr = process.communicate()
 
-    # Create the build directory if it doesn't exist
-    build_path = os.path.join(project_root, build_dir)
-    os.makedirs(build_path, exist_ok=True)
+    if stdout:
+        print(stdout)
+
+    if stderr:
+        print(stderr)
 
-    # Clean the build directory if requested
+    if process.returncode != 0:
+        print(f"Command failed with exit code {process.returncode}")
+        sys.exit(process.returncode)
+
+
+def run_command(command, cwd=None, env=None, capture=False):
+    """Run a command and print its output."""
+    wait_command(popen_command(command, cwd=cwd, env=env, capture=capture))
+
+
+def _available_cores():
+    """Get the number of CPU cores this process is allowed to run on."""
+    # sched_getaffinity respects cgroup/taskset limits inside containers,
+    # where cpu_count() reports every core on the host
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def build_cpp_components(
+    build_dir,
+    build_type,
+    clean,
+    skip_tests=False,
+    unity=False,
+    force_configure=False,
+    ninja=False,
+):
+    """Build the C++ components of the project."""
+    build_path = str(_PROJECT_ROOT / build_dir)
+
+    # Clean the build directory if requested. The old directory is moved out
+    # of the way, into the ignored cache directory in case the build is
+    # interrupted first, and deleted in the background while CMake runs.
+    cleanup_thread = None
     if clean and os.path.exists(build_path):
         print(f"Cleaning build directory: {build_path}")
-        for item in os.listdir(build_path):
-            item_path = os.path.join(build_path, item)
-            if os.path.isfile(item_path):
-                os.remove(item_path)
-            elif os.path.isdir(item_path):
-                import shutil
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        old_build_path = str(
+            _CACHE_DIR / f"{os.path.basename(build_path)}.old.{os.getpid()}"
+        )
+        try:
+            os.rename(build_path, old_build_path)
+        except OSError:
+            shutil.rmtree(build_path, ignore_errors=True)
+        else:
+            cleanup_thread = threading.Thread(
+                target=shutil.rmtree,
+                args=(old_build_path,),
+                kwargs={"ignore_errors": True},
+            )
+            cleanup_thread.start()
 
-                shutil.rmtree(item_path)
+    # Create the build directory if it doesn't exist
+    os.makedirs(build_path, exist_ok=True)
 
     # Configure with CMake
-    cmake_cmd = ["cmake", "..", f"-DCMAKE_BUILD_TYPE={build_type}"]
+    cmake_cmd = [
+        "cmake",
+        "..",
+        f"-DCMAKE_BUILD_TYPE={build_type}",
+        "-DCMAKE_EXPORT_COMPILE_COMMANDS=ON",
+    ]
+
+    # Batch sources into unity translation units so the heavy gRPC/protobuf
+    # headers are parsed once per batch rather than once per source file
+    if unity:
+        cmake_cmd.extend(
+            ["-DCMAKE_UNITY_BUILD=ON", "-DCMAKE_UNITY_BUILD_BATCH_SIZE=16"]
+        )
 
-    # Use MinGW Makefiles generator on Windows, default on other platforms
+    # Use MinGW Makefiles generator on Windows, and Ninja elsewhere only when
+    # asked for, since CMake can't switch an existing build's generator
     if platform.system() == "Windows":
         cmake_cmd.append("-G")
         cmake_cmd.append("MinGW Makefiles")
+    elif ninja:
+        if shutil.which("ninja") is None:
+            print("Error: --ninja was given but ninja was not found on PATH")
+            sys.exit(1)
+        if os.path.exists(os.path.join(build_path, "Makefile")):
+            print(
+                "Warning: the build directory is configured for Make; "
+                "use --clean to switch it to Ninja"
+            )
+        else:
+            cmake_cmd.append("-GNinja")
 
     # Add MSYS2 paths for Windows
     if platform.system() == "Windows":
@@ -71,15 +178,7 @@ def build_cpp_components(build_dir, build_type, clean, skip_tests=False):
 
             # Create a temporary CMake file to avoid Protobuf target conflicts
             temp_cmake_file = os.path.join(build_path, "FindProtobuf.cmake")
-            with open(temp_cmake_file, "w") as f:
-                f.write("""
-# Custom FindProtobuf.cmake to avoid target conflicts
-set(Protobuf_FOUND TRUE)
-set(Protobuf_INCLUDE_DIR "C:/msys64/ucrt64/include")
-set(Protobuf_LIBRARIES "C:/msys64/ucrt64/lib/libprotobuf.dll.a")
-set(Protobuf_PROTOC_EXECUTABLE "C:/msys64/ucrt64/bin/protoc.exe")
-set(Protobuf_VERSION "5.28.3")
-""")
+            pathlib.Path(temp_cmake_file).write_text(_FIND_PROTOBUF_TEMPLATE)
 
             # Add paths for dependencies and compilers
             cmake_cmd.extend(
@@ -98,7 +197,7 @@ set(Protobuf_VERSION "5.28.3")
 
             # Generate protobuf and gRPC files manually before CMake runs
             print("Generating protobuf and gRPC files manually...")
-            proto_path = os.path.join(project_root, "proto")
+            proto_path = str(_PROJECT_ROOT / "proto")
             proto_file = os.path.join(proto_path, "basecamp.proto")
             proto_gen_dir = os.path.join(build_path, "proto-gen")
             grpc_gen_dir = os.path.join(build_path, "grpc-gen")
@@ -107,26 +206,59 @@ set(Protobuf_VERSION "5.28.3")
             os.makedirs(proto_gen_dir, exist_ok=True)
             os.makedirs(grpc_gen_dir, exist_ok=True)
 
-            # Run protoc to generate protobuf files
+            # Run protoc once to generate both the protobuf and gRPC files,
+            # so the proto file is only parsed once
             protoc_cmd = [
                 f"{msys2_path}/bin/protoc.exe",
                 f"--proto_path={proto_path}",
                 f"--cpp_out={proto_gen_dir}",
+                f"--grpc_out={grpc_gen_dir}",
+                f"--plugin=protoc-gen-grpc={msys2_path}/bin/grpc_cpp_plugin.exe",
                 proto_file,
             ]
             run_command(protoc_cmd)
 
-            # Run protoc with grpc plugin to generate gRPC files
-            grpc_cmd = [
-                f"{msys2_path}/bin/protoc.exe",
-                f"--proto_path={proto_path}",
-                f"--grpc_out={grpc_gen_dir}",
-                f"--plugin=protoc-gen-grpc={msys2_path}/bin/grpc_cpp_plugin.exe",
-                proto_file,
+    # Use ccache as the compiler launcher if available, and let it hand off
+    # compilation to distcc when that is installed too
+    build_env = None
+    if shutil.which("ccache"):
+        print("Detected ccache, using it as the compiler launcher")
+        cmake_cmd.extend(
+            [
+                "-DCMAKE_C_COMPILER_LAUNCHER=ccache",
+                "-DCMAKE_CXX_COMPILER_LAUNCHER=ccache",
             ]
-            run_command(grpc_cmd)
+        )
 
-    run_command(cmake_cmd, cwd=build_path)
+        if shutil.which("distcc"):
+            print("Detected distcc, distributing compilation via CCACHE_PREFIX")
+            build_env = default_env()
+            build_env["CCACHE_PREFIX"] = "distcc"
+
+    # Skip the configure step if the build system was already generated with
+    # exactly the same CMake arguments. Ninja and Make re-run CMake on their
+    # own when the CMakeLists.txt files change, so the explicit configure is
+    # only needed on the first build or when the arguments change.
+    generated = any(
+        os.path.exists(os.path.join(build_path, name))
+        for name in ("build.ninja", "Makefile")
+    )
+    stamp_path = os.path.join(build_path, ".cmake_stamp")
+    stamp = hashlib.sha256(repr(cmake_cmd).encode()).hexdigest()
+    previous_stamp = None
+    if generated and os.path.exists(stamp_path):
+        with open(stamp_path, "r") as f:
+            previous_stamp = f.read().strip()
+
+    if force_configure or stamp != previous_stamp:
+        # Remove the old stamp first so a failed configure is retried
+        if os.path.exists(stamp_path):
+            os.remove(stamp_path)
+        run_command(cmake_cmd, cwd=build_path, env=build_env)
+        with open(stamp_path, "w") as f:
+            f.write(stamp)
+    else:
+        print("Build system is up to date, skipping configure step")
 
     # Build
     if skip_tests:
@@ -144,32 +276,59 @@ set(Protobuf_VERSION "5.28.3")
         # Build everything
         build_cmd = ["cmake", "--build", "."]
 
-    if platform.system() != "Windows":
-        # Use multiple cores on non-Windows platforms
-        import multiprocessing
+    # Use multiple cores on all platforms (generator-agnostic, so this also
+    # parallelizes MinGW Makefiles builds on Windows). Both Make and Ninja
+    # also get a load limit so they back off on busy or shared hosts.
+    cores = _available_cores()
+    build_cmd.extend(["--parallel", str(cores), "--", f"-l{cores}"])
+
+    run_command(build_cmd, cwd=build_path, env=build_env)
 
-        build_cmd.extend(["--", f"-j{multiprocessing.cpu_count()}"])
+    # Copy the compilation database to the project root for clangd and
+    # other tooling
+    compile_commands = os.path.join(build_path, "compile_commands.json")
+    if os.path.exists(compile_commands):
+        shutil.copy(compile_commands, _PROJECT_ROOT / "compile_commands.json")
 
-    run_command(build_cmd, cwd=build_path)
+    # Wait for the old build directory to finish being deleted
+    if cleanup_thread:
+        cleanup_thread.join()
 
     print(f"\nC++ components built successfully in {build_path}")
 
 
 def setup_python_client():
     """Set up the Python client."""
-    # Get the project root directory
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    python_client_dir = os.path.join(project_root, "src", "python_client")
+    python_client_dir = str(_PROJECT_ROOT / "src" / "python_client")
 
-    # Install dependencies
+    # Make sure pip can use (and cache) pre-built wheels, so grpcio and
+    # protobuf aren't compiled from source. Set PIP_CACHE_DIR to a persistent
+    # directory to reuse the wheel cache across CI runs.
     print("\nSetting up Python client...")
     run_command(
-        [sys.executable, "-m", "pip", "install", "-r", "requirements.txt"],
+        [sys.executable, "-m", "pip", "install", "-U", "pip", "wheel"],
         cwd=python_client_dir,
     )
 
-    # Generate Python code from proto file
-    run_command([sys.executable, "generate_proto.py"], cwd=python_client_dir)
+    # Install every requirement before generating code, since the generator
+    # imports grpc_tools and protobuf from the same site-packages that pip
+    # may be replacing; all the requirements are codegen dependencies, so
+    # nothing is left to install in parallel
+    run_command(
+        [
+            sys.executable,
+            "-m",
+            "pip",
+            "install",
+            "--prefer-binary",
+            "-r",
+            "requirements.txt",
+        ],
+        cwd=python_client_dir,
+    )
+
+    # Generate Python code from the proto file
+    run_command([sys.executable, "generate_proto.py", "--force"], cwd=python_client_dir)
 
     print("\nPython client set up successfully")
 
@@ -196,13 +355,39 @@ def main():
         "--python-only", action="store_true", help="Only set up Python client"
     )
     parser.add_argument("--skip-tests", action="store_true", help="Skip building tests")
+    parser.add_argument(
+        "--unity",
+        action="store_true",
+        help="Enable CMake unity builds (faster from-scratch builds; "
+        "leave off for incremental builds)",
+    )
+    parser.add_argument(
+        "--force-configure",
+        action="store_true",
+        help="Run the CMake configure step even if its arguments are unchanged",
+    )
+    parser.add_argument(
+        "--ninja",
+        action="store_true",
+        help="Use the Ninja generator instead of Make (not on Windows)",
+    )
 
     args = parser.parse_args()
 
+    # Create the persistent cache directories
+    os.makedirs(_PIP_CACHE_DIR, exist_ok=True)
+    os.makedirs(_CCACHE_DIR, exist_ok=True)
+
     # Build C++ components if requested
     if not args.python_only:
         build_cpp_components(
-            args.build_dir, args.build_type, args.clean, args.skip_tests
+            args.build_dir,
+            args.build_type,
+            args.clean,
+            args.skip_tests,
+            args.unity,
+            args.force_configure,
+            args.ninja,
         )
 
     # Set up Python client if requested
@@ -9,61 +9,87 @@ as the --remote-ip parameter when running setup_overlay.py.
 
 import socket
 import argparse
+import functools
+import shutil
 import subprocess
 import sys
 import platform
+import re
 
+# Patterns for the IPv4 addresses in ifconfig/ip addr and ipconfig output
+_INET_PATTERN = re.compile(r"inet (\d+\.\d+\.\d+\.\d+)")
+_IPCONFIG_PATTERN = re.compile(r"IPv4 Address[ .]*: *(\d+\.\d+\.\d+\.\d+)")
 
+# psutil is optional; without it we fall back to parsing ipconfig/ifconfig output
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+@functools.lru_cache(maxsize=1)
 def get_ip_address():
     """Get the IP address of the computer."""
     # Try to get the IP address by connecting to a public DNS server
     try:
         # This doesn't actually establish a connection, but it helps determine
         # which interface would be used to connect to an external server
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-        return ip
-    except Exception:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+    except OSError:
         # Fallback method
         hostname = socket.gethostname()
         return socket.gethostbyname(hostname)
 
 
+def _scan_command_output(command, pattern):
+    """Run a command and collect the non-loopback IPv4 addresses it prints."""
+    ip_addresses = []
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        for line in process.stdout:
+            match = pattern.search(line)
+            if match and match.group(1) != "127.0.0.1":
+                ip_addresses.append(match.group(1))
+    return ip_addresses
+
+
 def get_all_ip_addresses():
     """Get all IP addresses of the computer."""
     ip_addresses = []
 
+    # Enumerate the network interfaces in-process if psutil is available
+    if psutil is not None:
+        for addresses in psutil.net_if_addrs().values():
+            for address in addresses:
+                if address.family == socket.AF_INET and address.address != "127.0.0.1":
+                    ip_addresses.append(address.address)
+        return ip_addresses
+
+    # Otherwise try resolving the host name, which needs no subprocess
+    try:
+        infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+        ip_addresses = sorted(
+            {info[4][0] for info in infos if not info[4][0].startswith("127.")}
+        )
+    except OSError:
+        pass
+
+    if ip_addresses:
+        return ip_addresses
+
     # Get all network interfaces
     if platform.system() == "Windows":
         # On Windows, use ipconfig
         try:
-            output = subprocess.check_output("ipconfig", text=True)
-            for line in output.split("\n"):
-                if "IPv4 Address" in line:
-                    ip = line.split(":")[-1].strip()
-                    ip_addresses.append(ip)
+            ip_addresses = _scan_command_output(["ipconfig"], _IPCONFIG_PATTERN)
         except Exception as e:
             print(f"Error running ipconfig: {e}")
     else:
         # On Unix-like systems, use ifconfig or ip addr
         try:
-            if (
-                subprocess.run(["which", "ifconfig"], capture_output=True).returncode
-                == 0
-            ):
-                output = subprocess.check_output(["ifconfig"], text=True)
-                for line in output.split("\n"):
-                    if "inet " in line and "127.0.0.1" not in line:
-                        ip = line.split("inet ")[1].split(" ")[0]
-                        ip_addresses.append(ip)
-            else:
-                output = subprocess.check_output(["ip", "addr"], text=True)
-                for line in output.split("\n"):
-                    if "inet " in line and "127.0.0.1" not in line:
-                        ip = line.split("inet ")[1].split("/")[0]
-                        ip_addresses.append(ip)
+            command = ["ifconfig"] if shutil.which("ifconfig") else ["ip", "addr"]
+            ip_addresses = _scan_command_output(command, _INET_PATTERN)
         except Exception as e:
             print(f"Error getting IP addresses: {e}")
 
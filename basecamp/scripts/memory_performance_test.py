@@ -11,15 +11,24 @@ This script measures and compares:
 import os
 import sys
 import argparse
+import asyncio
+import itertools
 import time
 import random
+import socket
 import string
 import statistics
-import matplotlib.pyplot as plt
-import numpy as np
+import grpc
 from tabulate import tabulate
 import subprocess
 import json
+import tempfile
+
+# orjson is optional; without it the configuration goes through the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Add the Python client directory to the path
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,15 +37,14 @@ python_client_dir = os.path.abspath(
 )
 sys.path.append(python_client_dir)
 
-# Try to import the Python client and proto modules
+# Try to import the proto modules
 try:
-    from basecamp_client import BasecampClient
     from proto import basecamp_pb2
     from proto import basecamp_pb2_grpc
 except ImportError:
     # If the import fails, try to generate the Python code from the proto file
     print(
-        "Failed to import BasecampClient or proto modules. Trying to generate Python code from proto file..."
+        "Failed to import proto modules. Trying to generate Python code from proto file..."
     )
 
     # Try to import the generate_proto module
@@ -50,12 +58,12 @@ except ImportError:
         )
         output_dir = os.path.join(python_client_dir, "proto")
 
-        # Generate the Python code
-        generate_proto(proto_file, output_dir)
+        # Regenerate the Python code, since the import can fail on code that
+        # looks current but came from different tool versions
+        generate_proto(proto_file, output_dir, force=True)
 
-        # Try to import the Python client and proto modules again
+        # Try to import the proto modules again
         sys.path.append(output_dir)
-        from basecamp_client import BasecampClient
         from proto import basecamp_pb2
         from proto import basecamp_pb2_grpc
     except ImportError as e:
@@ -66,19 +74,79 @@ except ImportError:
         sys.exit(1)
 
 
-def generate_random_id(length=8):
-    """Generate a random ID."""
-    return "".join(random.choices(string.ascii_uppercase + string.digits, k=length))
+# Keep one long-lived channel warm across iterations and server restarts
+_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.so_reuseport", 1),
+    ("grpc.max_send_message_length", -1),
+    # Reconnect quickly once a restarted server starts listening
+    ("grpc.initial_reconnect_backoff_ms", 10),
+    ("grpc.min_reconnect_backoff_ms", 10),
+    ("grpc.max_reconnect_backoff_ms", 100),
+]
+
+# Deadline for gRPC calls in seconds, matching the Python client's default
+_RPC_TIMEOUT = 20
+
+# A batch stream gets the call deadline plus a small allowance per request,
+# capped so a hung server fails the run instead of stalling it
+_STREAM_TIMEOUT_PER_REQUEST = 0.1
+_STREAM_TIMEOUT_CAP = 300
+
+_ID_ALPHABET = string.ascii_uppercase + string.digits
+
+
+def generate_random_ids(count, length=8, rng=random):
+    """Generate a list of random IDs from a single bulk draw."""
+    chars = "".join(rng.choices(_ID_ALPHABET, k=count * length))
+    return [chars[i : i + length] for i in range(0, count * length, length)]
+
+
+def generate_test_data(num_items, rng=random):
+    """Generate random (key, value) pairs to write."""
+    keys = rng.choices(range(1000), k=num_items)
+    suffixes = generate_random_ids(num_items, 16, rng)
+    return [(key, f"Value_{key}_{suffix}") for key, suffix in zip(keys, suffixes)]
+
+
+def latency_percentiles(latencies_ns):
+    """Return the p50, p95 and p99 of per-operation latencies in milliseconds."""
+    if len(latencies_ns) < 2:
+        latency = latencies_ns[0] / 1e6 if latencies_ns else 0
+        return latency, latency, latency
+    cuts = statistics.quantiles(latencies_ns, n=100, method="inclusive")
+    return cuts[49] / 1e6, cuts[94] / 1e6, cuts[98] / 1e6
 
 
 class MemoryPerformanceTester:
     """Class to test performance differences between shared memory and regular memory."""
 
-    def __init__(self, server_address, config_path):
+    def __init__(self, server_address, config_path, concurrency=8, seed=42):
         """Initialize the tester with a server address and config path."""
         self.server_address = server_address
         self.config_path = config_path
-        self.client = BasecampClient(server_address)
+        # Seed the test data so runs and backends are compared on the same data
+        self.rng = random.Random(seed)
+        self.concurrency = max(1, concurrency)
+
+        # Multiplex the batch streams over one asyncio channel on a private loop
+        self.loop = asyncio.new_event_loop()
+        self.channel = self.loop.run_until_complete(self._open_channel())
+        self.stub = basecamp_pb2_grpc.BasecampServiceStub(self.channel)
+        self.server_process = None
+        self.temp_config_path = None
+
+        # Resolve the server binary once, adding the .exe extension on Windows
+        self.server_path = os.path.join(
+            os.path.dirname(script_dir), "build", "src", "server", "basecamp_server"
+        )
+        if sys.platform == "win32":
+            self.server_path += ".exe"
+
+        self.request_pool = {}
+        self.data = None
+        self.loaded_backend = None
         self.results = {
             "shared_memory": {
                 "write": [],
@@ -91,67 +159,230 @@ class MemoryPerformanceTester:
         }
 
         # Load the configuration
-        with open(config_path, "r") as f:
-            self.config = json.load(f)
+        with open(config_path, "rb") as f:
+            config_data = f.read()
+        self.config = (
+            orjson.loads(config_data) if orjson is not None else json.loads(config_data)
+        )
+
+        # Serialize the configuration for each memory backend once
+        self.config_bytes = {}
+        for use_shared_memory in (True, False):
+            config = {**self.config, "use_shared_memory": use_shared_memory}
+            if orjson is not None:
+                self.config_bytes[use_shared_memory] = orjson.dumps(
+                    config, option=orjson.OPT_INDENT_2
+                )
+            else:
+                self.config_bytes[use_shared_memory] = json.dumps(
+                    config, indent=2
+                ).encode()
 
     def modify_config(self, use_shared_memory):
         """Modify the configuration to use shared memory or regular memory."""
-        # Create a copy of the configuration
-        config_copy = self.config.copy()
+        # Write the modified configuration to a temporary file, in tmpfs if available
+        temp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        with tempfile.NamedTemporaryFile(
+            "wb", suffix=".json", dir=temp_dir, delete=False
+        ) as f:
+            f.write(self.config_bytes[use_shared_memory])
+
+        return f.name
+
+    def _restart_with_backend(self, use_shared_memory):
+        """Restart the server on the shared memory or regular memory backend."""
+        temp_config_path = self.modify_config(use_shared_memory=use_shared_memory)
+        try:
+            self.restart_server_with_config(temp_config_path)
+        finally:
+            # A ready channel doesn't prove the new server has read its
+            # configuration, so keep the file until that server is stopped
+            self.temp_config_path = temp_config_path
+
+    def _build_requests(self, data, query_type):
+        """Fill pooled query requests for a batch of (key, value) pairs."""
+        # Reuse the message objects across batches and only rewrite the fields
+        # that change; query IDs stay unique so the server cache is never hit
+        pool = self.request_pool.setdefault(query_type, [])
+        while len(pool) < len(data):
+            pool.append(basecamp_pb2.QueryRequest(query_type=query_type))
+        requests = pool[: len(data)]
+
+        prefix = "write" if query_type == "write" else "read"
+        query_ids = generate_random_ids(len(data), rng=self.rng)
+        client_ids = generate_random_ids(len(data), rng=self.rng)
+        # Give each request a distinct timestamp without reading the clock per request
+        timestamps = itertools.count(time.time_ns() // 1_000_000)
+        for request, (key, value), query_id, client_id in zip(
+            requests, data, query_ids, client_ids
+        ):
+            request.query_id = f"{prefix}_{query_id}"
+            request.client_id = f"client_{client_id}"
+            request.key = key
+            request.timestamp = next(timestamps)
+            if query_type == "write":
+                request.string_param = value
+
+        return requests
+
+    async def _open_channel(self):
+        """Open the asyncio channel on the tester's event loop."""
+        return grpc.aio.insecure_channel(self.server_address, options=_CHANNEL_OPTIONS)
 
-        # Set the use_shared_memory flag
-        config_copy["use_shared_memory"] = use_shared_memory
+    async def _send_stream(self, requests):
+        """Send query requests over a single QueryDataBatch stream."""
+        # Use one bounded deadline for the whole stream
+        timeout = min(
+            _RPC_TIMEOUT + _STREAM_TIMEOUT_PER_REQUEST * len(requests),
+            _STREAM_TIMEOUT_CAP,
+        )
+        call = self.stub.QueryDataBatch(timeout=timeout)
+
+        # Keep one request outstanding at a time: the server answers a stream
+        # in order, so pipelining would add the time spent behind earlier
+        # requests to each latency
+        latencies = []
+        for request in requests:
+            start = time.perf_counter_ns()
+            await call.write(request)
+            # Fail on a single response that never arrives, not just the stream
+            await asyncio.wait_for(call.read(), timeout=_RPC_TIMEOUT)
+            latencies.append(time.perf_counter_ns() - start)
+
+        # Drain the end of the stream so it completes before returning
+        await call.done_writing()
+        await call.read()
+        return latencies
+
+    async def _run_batch(self, requests):
+        """Send a batch of query requests over concurrent QueryDataBatch streams."""
+        # Split the batch so the server sees several streams in flight at once
+        chunks = [requests[i :: self.concurrency] for i in range(self.concurrency)]
+        return await asyncio.gather(
+            *(self._send_stream(chunk) for chunk in chunks if chunk)
+        )
+
+    def _send_batch(self, requests):
+        """Send a batch of query requests and return their latencies in nanoseconds."""
+        latencies = []
+        for stream_latencies in self.loop.run_until_complete(self._run_batch(requests)):
+            latencies.extend(stream_latencies)
+        return latencies
+
+    def _record_results(self, name, operation, times, latencies):
+        """Compute and store the statistics for one memory backend and operation."""
+        avg_time = statistics.mean(times)
+        std_dev = statistics.stdev(times) if len(times) > 1 else 0
+        p50, p95, p99 = latency_percentiles(latencies)
+        total_time = sum(times) / 1000  # Convert to seconds
+        ops_per_sec = len(latencies) / total_time if total_time > 0 else 0
+
+        # Store the results
+        self.results[name][operation] = {
+            "times": times,
+            "avg": avg_time,
+            "std_dev": std_dev,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "ops_per_sec": ops_per_sec,
+        }
 
-        # Write the modified configuration to a temporary file
-        temp_config_path = "temp_config.json"
-        with open(temp_config_path, "w") as f:
-            json.dump(config_copy, f, indent=2)
+        label = name.replace("_", " ")
+        print(
+            f"Average {label} {operation} time: {avg_time:.2f} ms (std dev: {std_dev:.2f} ms)"
+        )
+        print(
+            f"Per-operation latency: p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms ({ops_per_sec:.0f} ops/s)"
+        )
+        return self.results[name][operation]
+
+    def close(self):
+        """Close the asyncio channel and its event loop."""
+        self.loop.run_until_complete(self.channel.close())
+        self.loop.close()
+
+    def _wait_for_port_closed(self, port, timeout=5.0):
+        """Wait until nothing is listening on the given local port."""
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while time.monotonic() < deadline:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                if sock.connect_ex(("127.0.0.1", int(port))) != 0:
+                    return
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        raise TimeoutError(
+            f"Port {port} is still in use after {timeout:.0f} seconds; "
+            "stop the server listening on it and try again"
+        )
 
-        return temp_config_path
+    def stop_server(self):
+        """Stop the server started by this tester, if any."""
+        if self.server_process is not None:
+            # Only signal the process we started, never other matching processes
+            self.server_process.terminate()
+            try:
+                self.server_process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.server_process.kill()
+                self.server_process.wait()
+            self.server_process = None
+
+        # Remove the temporary configuration the stopped server was started with
+        if self.temp_config_path is not None:
+            os.unlink(self.temp_config_path)
+            self.temp_config_path = None
 
     def restart_server_with_config(self, config_path, node_id="A"):
         """Restart the server with the specified configuration."""
-        # Stop any running server
+        # Get the port from the server address
+        port = self.server_address.split(":")[-1]
+
+        # Stop the previously started server
         try:
-            subprocess.run(["pkill", "-f", "basecamp_server"], check=False)
-            time.sleep(1)  # Wait for the server to stop
+            self.stop_server()
         except Exception as e:
             print(f"Error stopping server: {e}")
 
-        # Start the server with the new configuration
-        server_path = os.path.abspath(
-            os.path.join(
-                os.path.dirname(script_dir), "build", "src", "server", "basecamp_server"
-            )
-        )
+        # Fail rather than benchmark some other server still holding the port
+        self._wait_for_port_closed(port)
 
-        # Add .exe extension on Windows
-        if sys.platform == "win32":
-            server_path += ".exe"
-
-        # Start the server
+        # Start the server with the new configuration
         try:
-            # Get the port from the server address
-            port = self.server_address.split(":")[-1]
             address = f"0.0.0.0:{port}"
 
-            # Start the server in the background
-            subprocess.Popen(
-                [
-                    server_path,
-                    "--address",
-                    address,
-                    "--node-id",
-                    node_id,
-                    "--config",
-                    config_path,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+            # Start the server in the background, logging to a file so its
+            # output can never fill an undrained pipe and stall it
+            log_path = os.path.join(tempfile.gettempdir(), f"basecamp_{node_id}.log")
+            with open(log_path, "w") as log_file:
+                self.server_process = subprocess.Popen(
+                    [
+                        self.server_path,
+                        "--address",
+                        address,
+                        "--node-id",
+                        node_id,
+                        "--config",
+                        config_path,
+                    ],
+                    executable=self.server_path,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                )
+
+            # Wait for the server to start and the channel to reconnect
+            self.loop.run_until_complete(
+                asyncio.wait_for(self.channel.channel_ready(), timeout=10)
             )
 
-            # Wait for the server to start
-            time.sleep(2)
+            # A server that failed to start leaves the channel free to connect
+            # to some other server on the port, so make sure ours is running
+            returncode = self.server_process.poll()
+            if returncode is not None:
+                raise RuntimeError(
+                    f"Server exited with code {returncode} during startup; see {log_path}"
+                )
 
             print(f"Server restarted with configuration: {config_path}")
         except Exception as e:
@@ -166,331 +397,155 @@ class MemoryPerformanceTester:
 
         # Test shared memory
         print("\nTesting shared memory write performance...")
-        temp_config_path = self.modify_config(use_shared_memory=True)
-        self.restart_server_with_config(temp_config_path)
+        self._restart_with_backend(use_shared_memory=True)
+
+        # Write the same data set in every iteration so the read test can reuse it
+        data = self._test_data(num_items)
 
         times_shared_memory = []
+        latencies_shared_memory = []
         for i in range(num_iterations):
-            # Generate random data
-            data = []
-            for j in range(num_items):
-                key = random.randint(0, 999)
-                value = f"Value_{key}_{generate_random_id(16)}"
-                data.append((key, value))
+            # Build the write requests ahead of the timed region
+            requests = self._build_requests(data, "write")
 
             # Measure write time
-            start_time = time.time()
-            for key, value in data:
-                # Create a query request to write data
-                query_id = f"write_{generate_random_id()}"
-                client_id = f"client_{generate_random_id()}"
-
-                request = basecamp_pb2.QueryRequest(
-                    query_id=query_id,
-                    client_id=client_id,
-                    key=key,
-                    query_type="write",
-                    timestamp=int(time.time() * 1000),
-                )
-
-                # Add the value as a parameter
-                request.string_param = value
-
-                # Send the query with a longer timeout
-                self.client.stub.QueryData(request, timeout=self.client.timeout * 10)
-
-            end_time = time.time()
+            start_time = time.perf_counter_ns()
+            batch_latencies = self._send_batch(requests)
+            end_time = time.perf_counter_ns()
 
             # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
+            time_taken = (end_time - start_time) / 1e6  # Convert to milliseconds
             times_shared_memory.append(time_taken)
+            latencies_shared_memory.extend(batch_latencies)
 
             print(f"Iteration {i+1}: {time_taken:.2f} ms")
 
-        # Calculate statistics
-        avg_time_shared_memory = statistics.mean(times_shared_memory)
-        std_dev_shared_memory = (
-            statistics.stdev(times_shared_memory) if len(times_shared_memory) > 1 else 0
-        )
+        # The server now holds the whole data set on this backend
+        self.loaded_backend = True
 
-        # Store the results
-        self.results["shared_memory"]["write"] = {
-            "times": times_shared_memory,
-            "avg": avg_time_shared_memory,
-            "std_dev": std_dev_shared_memory,
-        }
-
-        print(
-            f"Average shared memory write time: {avg_time_shared_memory:.2f} ms (std dev: {std_dev_shared_memory:.2f} ms)"
+        shared_memory = self._record_results(
+            "shared_memory", "write", times_shared_memory, latencies_shared_memory
         )
 
         # Test regular memory
         print("\nTesting regular memory write performance...")
-        temp_config_path = self.modify_config(use_shared_memory=False)
-        self.restart_server_with_config(temp_config_path)
+        self._restart_with_backend(use_shared_memory=False)
 
         times_regular_memory = []
+        latencies_regular_memory = []
         for i in range(num_iterations):
-            # Generate random data
-            data = []
-            for j in range(num_items):
-                key = random.randint(0, 999)
-                value = f"Value_{key}_{generate_random_id(16)}"
-                data.append((key, value))
+            # Build the write requests ahead of the timed region
+            requests = self._build_requests(data, "write")
 
             # Measure write time
-            start_time = time.time()
-            for key, value in data:
-                # Create a query request to write data
-                query_id = f"write_{generate_random_id()}"
-                client_id = f"client_{generate_random_id()}"
-
-                request = basecamp_pb2.QueryRequest(
-                    query_id=query_id,
-                    client_id=client_id,
-                    key=key,
-                    query_type="write",
-                    timestamp=int(time.time() * 1000),
-                )
-
-                # Add the value as a parameter
-                request.string_param = value
-
-                # Send the query with a longer timeout
-                self.client.stub.QueryData(request, timeout=self.client.timeout * 10)
-
-            end_time = time.time()
+            start_time = time.perf_counter_ns()
+            batch_latencies = self._send_batch(requests)
+            end_time = time.perf_counter_ns()
 
             # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
+            time_taken = (end_time - start_time) / 1e6  # Convert to milliseconds
             times_regular_memory.append(time_taken)
+            latencies_regular_memory.extend(batch_latencies)
 
             print(f"Iteration {i+1}: {time_taken:.2f} ms")
 
-        # Calculate statistics
-        avg_time_regular_memory = statistics.mean(times_regular_memory)
-        std_dev_regular_memory = (
-            statistics.stdev(times_regular_memory)
-            if len(times_regular_memory) > 1
-            else 0
-        )
-
-        # Store the results
-        self.results["regular_memory"]["write"] = {
-            "times": times_regular_memory,
-            "avg": avg_time_regular_memory,
-            "std_dev": std_dev_regular_memory,
-        }
+        # The server now holds the whole data set on this backend
+        self.loaded_backend = False
 
-        print(
-            f"Average regular memory write time: {avg_time_regular_memory:.2f} ms (std dev: {std_dev_regular_memory:.2f} ms)"
+        regular_memory = self._record_results(
+            "regular_memory", "write", times_regular_memory, latencies_regular_memory
         )
 
         # Compare the results
         speedup = (
-            avg_time_regular_memory / avg_time_shared_memory
-            if avg_time_shared_memory > 0
+            regular_memory["avg"] / shared_memory["avg"]
+            if shared_memory["avg"] > 0
             else 0
         )
         print(f"\nShared memory write speedup: {speedup:.2f}x")
 
-        # Clean up
-        os.remove(temp_config_path)
-
         return {
-            "shared_memory": {
-                "avg": avg_time_shared_memory,
-                "std_dev": std_dev_shared_memory,
-            },
-            "regular_memory": {
-                "avg": avg_time_regular_memory,
-                "std_dev": std_dev_regular_memory,
-            },
+            "shared_memory": shared_memory,
+            "regular_memory": regular_memory,
             "speedup": speedup,
         }
 
-    def test_read_performance(self, num_items=100, num_iterations=5):
-        """Test read performance for shared memory and regular memory."""
-        print(
-            f"Testing read performance with {num_items} items and {num_iterations} iterations..."
-        )
-
-        # Test shared memory
-        print("\nTesting shared memory read performance...")
-        temp_config_path = self.modify_config(use_shared_memory=True)
-        self.restart_server_with_config(temp_config_path)
-
-        # First, write some data to read
-        print("Writing data to shared memory...")
-        data = []
-        for j in range(num_items):
-            key = random.randint(0, 999)
-            value = f"Value_{key}_{generate_random_id(16)}"
-            data.append((key, value))
-
-            # Create a query request to write data
-            query_id = f"write_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                key=key,
-                query_type="write",
-                timestamp=int(time.time() * 1000),
-            )
-
-            # Add the value as a parameter
-            request.string_param = value
-
-            # Send the query with a longer timeout
-            self.client.stub.QueryData(request, timeout=self.client.timeout * 10)
-
-        # Now test read performance
-        times_shared_memory = []
+    def _test_data(self, num_items):
+        """Return the test data set shared by the write and read tests."""
+        if self.data is None or len(self.data) != num_items:
+            self.data = generate_test_data(num_items, self.rng)
+            self.loaded_backend = None
+        return self.data
+
+    def _load_backend(self, use_shared_memory, data):
+        """Restart the server on a memory backend and write the test data to it."""
+        label = "shared" if use_shared_memory else "regular"
+        if self.loaded_backend == use_shared_memory:
+            print(f"Reusing data already written to {label} memory...")
+            return
+
+        self._restart_with_backend(use_shared_memory)
+
+        # Write the data to read
+        print(f"Writing data to {label} memory...")
+        self._send_batch(self._build_requests(data, "write"))
+        self.loaded_backend = use_shared_memory
+
+    def _test_read_backend(self, use_shared_memory, data, num_iterations):
+        """Test read performance for a single memory backend."""
+        name = "shared_memory" if use_shared_memory else "regular_memory"
+        label = name.replace("_", " ")
+        print(f"\nTesting {label} read performance...")
+        self._load_backend(use_shared_memory, data)
+
+        times = []
+        latencies = []
         for i in range(num_iterations):
-            # Measure read time
-            start_time = time.time()
-            for key, _ in data:
-                # Create a query request to read data
-                query_id = f"read_{generate_random_id()}"
-                client_id = f"client_{generate_random_id()}"
-
-                request = basecamp_pb2.QueryRequest(
-                    query_id=query_id,
-                    client_id=client_id,
-                    key=key,
-                    query_type="exact",
-                    timestamp=int(time.time() * 1000),
-                )
-
-                # Send the query
-                self.client.stub.QueryData(request, timeout=self.client.timeout * 2)
-
-            end_time = time.time()
+            # Build the read requests ahead of the timed region
+            requests = self._build_requests(data, "exact")
 
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_shared_memory.append(time_taken)
-
-            print(f"Iteration {i+1}: {time_taken:.2f} ms")
-
-        # Calculate statistics
-        avg_time_shared_memory = statistics.mean(times_shared_memory)
-        std_dev_shared_memory = (
-            statistics.stdev(times_shared_memory) if len(times_shared_memory) > 1 else 0
-        )
-
-        # Store the results
-        self.results["shared_memory"]["read"] = {
-            "times": times_shared_memory,
-            "avg": avg_time_shared_memory,
-            "std_dev": std_dev_shared_memory,
-        }
-
-        print(
-            f"Average shared memory read time: {avg_time_shared_memory:.2f} ms (std dev: {std_dev_shared_memory:.2f} ms)"
-        )
-
-        # Test regular memory
-        print("\nTesting regular memory read performance...")
-        temp_config_path = self.modify_config(use_shared_memory=False)
-        self.restart_server_with_config(temp_config_path)
-
-        # First, write some data to read
-        print("Writing data to regular memory...")
-        data = []
-        for j in range(num_items):
-            key = random.randint(0, 999)
-            value = f"Value_{key}_{generate_random_id(16)}"
-            data.append((key, value))
-
-            # Create a query request to write data
-            query_id = f"write_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                key=key,
-                query_type="write",
-                timestamp=int(time.time() * 1000),
-            )
-
-            # Add the value as a parameter
-            request.string_param = value
-
-            # Send the query
-            self.client.stub.QueryData(request, timeout=self.client.timeout * 2)
-
-        # Now test read performance
-        times_regular_memory = []
-        for i in range(num_iterations):
             # Measure read time
-            start_time = time.time()
-            for key, _ in data:
-                # Create a query request to read data
-                query_id = f"read_{generate_random_id()}"
-                client_id = f"client_{generate_random_id()}"
-
-                request = basecamp_pb2.QueryRequest(
-                    query_id=query_id,
-                    client_id=client_id,
-                    key=key,
-                    query_type="exact",
-                    timestamp=int(time.time() * 1000),
-                )
-
-                # Send the query
-                self.client.stub.QueryData(request, timeout=self.client.timeout * 2)
-
-            end_time = time.time()
+            start_time = time.perf_counter_ns()
+            batch_latencies = self._send_batch(requests)
+            end_time = time.perf_counter_ns()
 
             # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_regular_memory.append(time_taken)
+            time_taken = (end_time - start_time) / 1e6  # Convert to milliseconds
+            times.append(time_taken)
+            latencies.extend(batch_latencies)
 
             print(f"Iteration {i+1}: {time_taken:.2f} ms")
 
-        # Calculate statistics
-        avg_time_regular_memory = statistics.mean(times_regular_memory)
-        std_dev_regular_memory = (
-            statistics.stdev(times_regular_memory)
-            if len(times_regular_memory) > 1
-            else 0
-        )
-
-        # Store the results
-        self.results["regular_memory"]["read"] = {
-            "times": times_regular_memory,
-            "avg": avg_time_regular_memory,
-            "std_dev": std_dev_regular_memory,
-        }
+        self._record_results(name, "read", times, latencies)
 
+    def test_read_performance(self, num_items=100, num_iterations=5):
+        """Test read performance for shared memory and regular memory."""
         print(
-            f"Average regular memory read time: {avg_time_regular_memory:.2f} ms (std dev: {std_dev_regular_memory:.2f} ms)"
+            f"Testing read performance with {num_items} items and {num_iterations} iterations..."
         )
+        data = self._test_data(num_items)
+
+        # Start with the backend that already holds the data, if any, so its
+        # restart and write prelude can be skipped
+        backends = [True, False]
+        if self.loaded_backend is False:
+            backends.reverse()
+        for use_shared_memory in backends:
+            self._test_read_backend(use_shared_memory, data, num_iterations)
 
         # Compare the results
+        shared_memory = self.results["shared_memory"]["read"]
+        regular_memory = self.results["regular_memory"]["read"]
         speedup = (
-            avg_time_regular_memory / avg_time_shared_memory
-            if avg_time_shared_memory > 0
+            regular_memory["avg"] / shared_memory["avg"]
+            if shared_memory["avg"] > 0
             else 0
         )
         print(f"\nShared memory read speedup: {speedup:.2f}x")
 
-        # Clean up
-        os.remove(temp_config_path)
-
         return {
-            "shared_memory": {
-                "avg": avg_time_shared_memory,
-                "std_dev": std_dev_shared_memory,
-            },
-            "regular_memory": {
-                "avg": avg_time_regular_memory,
-                "std_dev": std_dev_regular_memory,
-            },
+            "shared_memory": shared_memory,
+            "regular_memory": regular_memory,
             "speedup": speedup,
         }
 
@@ -529,6 +584,8 @@ class MemoryPerformanceTester:
             "Memory Type",
             "Avg Time (ms)",
             "Std Dev (ms)",
+            "p99 (ms)",
+            "Ops/s",
             "Speedup",
         ]
 
@@ -539,6 +596,8 @@ class MemoryPerformanceTester:
                 "Shared Memory",
                 f"{write_results['shared_memory']['avg']:.2f}",
                 f"{write_results['shared_memory']['std_dev']:.2f}",
+                f"{write_results['shared_memory']['p99']:.2f}",
+                f"{write_results['shared_memory']['ops_per_sec']:.0f}",
                 "-",
             ]
         )
@@ -548,6 +607,8 @@ class MemoryPerformanceTester:
                 "Regular Memory",
                 f"{write_results['regular_memory']['avg']:.2f}",
                 f"{write_results['regular_memory']['std_dev']:.2f}",
+                f"{write_results['regular_memory']['p99']:.2f}",
+                f"{write_results['regular_memory']['ops_per_sec']:.0f}",
                 f"{write_results['speedup']:.2f}x",
             ]
         )
@@ -559,6 +620,8 @@ class MemoryPerformanceTester:
                 "Shared Memory",
                 f"{read_results['shared_memory']['avg']:.2f}",
                 f"{read_results['shared_memory']['std_dev']:.2f}",
+                f"{read_results['shared_memory']['p99']:.2f}",
+                f"{read_results['shared_memory']['ops_per_sec']:.0f}",
                 "-",
             ]
         )
@@ -568,6 +631,8 @@ class MemoryPerformanceTester:
                 "Regular Memory",
                 f"{read_results['regular_memory']['avg']:.2f}",
                 f"{read_results['regular_memory']['std_dev']:.2f}",
+                f"{read_results['regular_memory']['p99']:.2f}",
+                f"{read_results['regular_memory']['ops_per_sec']:.0f}",
                 f"{read_results['speedup']:.2f}x",
             ]
         )
@@ -592,9 +657,17 @@ class MemoryPerformanceTester:
 
     def generate_plots(self):
         """Generate plots of the memory performance results."""
+        # Import the plotting libraries only when plots are generated, and
+        # render off-screen since the plots are only saved to files
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import numpy as np
+
         try:
-            # Create a figure with subplots
-            fig, axs = plt.subplots(1, 2, figsize=(12, 5))
+            # Create a single figure with subplots so only one PNG is encoded
+            fig, axs = plt.subplots(1, 3, figsize=(18, 5))
 
             # Plot write performance results
             shared_memory_write = self.results["shared_memory"]["write"]
@@ -620,16 +693,7 @@ class MemoryPerformanceTester:
             axs[1].set_ylabel("Average Time (ms)")
             axs[1].grid(axis="y", linestyle="--", alpha=0.7)
 
-            # Adjust layout and save the figure
-            plt.tight_layout()
-            plt.savefig("memory_performance_results.png")
-            print(
-                "\nMemory performance plots saved to 'memory_performance_results.png'"
-            )
-
-            # Create a comparison plot
-            plt.figure(figsize=(10, 6))
-
+            # Plot the comparison of both operations
             operations = ["Write", "Read"]
             shared_memory = [shared_memory_write["avg"], shared_memory_read["avg"]]
             regular_memory = [regular_memory_write["avg"], regular_memory_read["avg"]]
@@ -637,20 +701,23 @@ class MemoryPerformanceTester:
             x = np.arange(len(operations))
             width = 0.35
 
-            plt.bar(x - width / 2, shared_memory, width, label="Shared Memory")
-            plt.bar(x + width / 2, regular_memory, width, label="Regular Memory")
+            axs[2].bar(x - width / 2, shared_memory, width, label="Shared Memory")
+            axs[2].bar(x + width / 2, regular_memory, width, label="Regular Memory")
 
-            plt.xlabel("Operation")
-            plt.ylabel("Average Time (ms)")
-            plt.title("Memory Performance Comparison")
-            plt.xticks(x, operations)
-            plt.legend()
-            plt.grid(axis="y", linestyle="--", alpha=0.7)
+            axs[2].set_xlabel("Operation")
+            axs[2].set_ylabel("Average Time (ms)")
+            axs[2].set_title("Memory Performance Comparison")
+            axs[2].set_xticks(x)
+            axs[2].set_xticklabels(operations)
+            axs[2].legend()
+            axs[2].grid(axis="y", linestyle="--", alpha=0.7)
 
-            plt.tight_layout()
-            plt.savefig("memory_performance_comparison.png")
+            # Adjust layout and save the figure
+            fig.tight_layout()
+            fig.savefig("memory_performance_results.png", dpi=100)
+            plt.close(fig)
             print(
-                "Memory performance comparison plot saved to 'memory_performance_comparison.png'"
+                "\nMemory performance plots saved to 'memory_performance_results.png'"
             )
 
         except Exception as e:
@@ -688,6 +755,18 @@ def main():
         default="all_tests",
         help="Test to run (default: all_tests)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of concurrent request streams per batch (default: 8)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Seed for the generated test data (default: 42)",
+    )
 
     args = parser.parse_args()
 
@@ -699,19 +778,29 @@ def main():
         print(f"Replacing 0.0.0.0 with 127.0.0.1, using {server_address}")
 
     # Create a memory performance tester
-    tester = MemoryPerformanceTester(server_address, args.config)
+    tester = MemoryPerformanceTester(
+        server_address,
+        args.config,
+        concurrency=args.concurrency,
+        seed=args.seed,
+    )
 
     # Run the specified test
-    if args.test == "write":
-        tester.test_write_performance(
-            num_items=args.items, num_iterations=args.iterations
-        )
-    elif args.test == "read":
-        tester.test_read_performance(
-            num_items=args.items, num_iterations=args.iterations
-        )
-    else:  # all_tests
-        tester.run_all_tests(num_items=args.items, num_iterations=args.iterations)
+    try:
+        if args.test == "write":
+            tester.test_write_performance(
+                num_items=args.items, num_iterations=args.iterations
+            )
+        elif args.test == "read":
+            tester.test_read_performance(
+                num_items=args.items, num_iterations=args.iterations
+            )
+        else:  # all_tests
+            tester.run_all_tests(num_items=args.items, num_iterations=args.iterations)
+    finally:
+        # Don't leave the server running, since later runs no longer pkill it
+        tester.stop_server()
+        tester.close()
 
 
 if __name__ == "__main__":
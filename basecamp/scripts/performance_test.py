@@ -12,13 +12,19 @@ This script measures and compares:
 import os
 import sys
 import argparse
+import collections
+import contextlib
+import csv
+import gc
+import itertools
+import multiprocessing
 import time
 import random
-import string
-import statistics
-import matplotlib.pyplot as plt
+import secrets
+import threading
+import grpc
 import numpy as np
-from tabulate import tabulate
+from concurrent import futures
 
 # Add the Python client directory to the path
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -49,8 +55,9 @@ except ImportError:
         )
         output_dir = os.path.join(python_client_dir, "proto")
 
-        # Generate the Python code
-        generate_proto(proto_file, output_dir)
+        # Regenerate the Python code, since the import can fail on code that
+        # looks current but came from different tool versions
+        generate_proto(proto_file, output_dir, force=True)
 
         # Try to import the Python client and proto modules again
         sys.path.append(output_dir)
@@ -65,18 +72,197 @@ except ImportError:
         sys.exit(1)
 
 
-def generate_random_id(length=8):
-    """Generate a random ID."""
-    return "".join(random.choices(string.ascii_uppercase + string.digits, k=length))
+# Keep one channel open for the whole benchmark without reconnects or
+# flow-control stalls
+_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.http2.min_time_between_pings_ms", 10000),
+    ("grpc.http2.bdp_probe", 1),
+    ("grpc.http2.initial_window_size", 8 * 1024 * 1024),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+# Range widths swept by default, from overhead-bound to transfer-bound queries
+_RANGE_WIDTHS = (100, 1000, 10000)
+
+# Monotonic nanosecond clock for measurements; wall-clock time is only used for
+# the protobuf timestamp field
+_now = time.perf_counter_ns
+
+
+# Per-process prefix plus a counter, so IDs never repeat across runs against
+# the same server (whose query cache is keyed by query ID)
+_ID_PREFIX = secrets.token_hex(4)
+_ID_COUNTER = itertools.count()
+
+
+def _mean_std(times):
+    """Return the mean and sample standard deviation of an array of times."""
+    if not times.size:
+        return 0.0, 0.0
+    return times.mean(), times.std(ddof=1) if times.size > 1 else 0.0
+
+
+def summarize_times(times):
+    """Summarize a list of times in milliseconds."""
+    times = np.asarray(times, dtype=np.float64)
+    avg, std_dev = _mean_std(times)
+    p50, p95, p99 = np.percentile(times, [50, 95, 99]) if times.size else (0, 0, 0)
+    return {
+        "times": times,
+        "avg": avg,
+        "std_dev": std_dev,
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+    }
+
+
+def generate_random_id():
+    """Generate a unique ID."""
+    return f"{_ID_PREFIX}{next(_ID_COUNTER):08x}"
+
+
+@contextlib.contextmanager
+def quiet_measurement(core=None):
+    """Keep garbage collection and core migrations out of a timed section."""
+    # Collect up front so no collection pauses land inside the measurement
+    gc.collect()
+    gc.disable()
+
+    # Optionally pin to one core (Linux only). This pins only the calling
+    # thread and any threads started inside the block, so it suits the
+    # single-stream phases; concurrent phases must not pin, or their worker
+    # threads would share the core and keep it after the block ends
+    old_affinity = None
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        old_affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, {core})
+
+    try:
+        yield
+    finally:
+        gc.enable()
+        if old_affinity is not None:
+            os.sched_setaffinity(0, old_affinity)
+
+
+def report_cache_mismatches(iterations, problem):
+    """Print one warning listing the iterations whose cache status was wrong."""
+    if iterations:
+        shown = ", ".join(str(i) for i in iterations[:10])
+        more = ", ..." if len(iterations) > 10 else ""
+        print(
+            f"Warning: {len(iterations)} results were {problem} "
+            f"(iterations {shown}{more})"
+        )
+
+
+def result_label(name):
+    """Turn a results key such as "range_query_1000" into a display label."""
+    query_type, _, width = name.partition("_query")
+    label = query_type.capitalize()
+    return f"{label} (width {width[1:]})" if width else label
+
+
+def format_table(headers, rows):
+    """Format rows of strings as a grid table."""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    border = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    lines = [border]
+    for i, row in enumerate([headers, *rows]):
+        cells = " | ".join(f"{str(cell):<{width}}" for cell, width in zip(row, widths))
+        lines.append(f"| {cells} |")
+        lines.append(border.replace("-", "=") if i == 0 else border)
+    return "\n".join(lines)
+
+
+def render_plots(averages):
+    """Plot average query times keyed by query label and cache mode."""
+    try:
+        # Import matplotlib here so runs that never plot don't pay for it, and
+        # render off-screen so headless runs never initialise a GUI toolkit
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        # Draw every plot into a single figure: per-query results on the
+        # top row and the comparison across query types on the bottom row
+        query_types = list(averages)
+        fig, axs = plt.subplots(
+            2, len(query_types), figsize=(5 * len(query_types), 10), squeeze=False
+        )
+
+        with_cache = []
+        without_cache = []
+        for ax, query_type in zip(axs[0], query_types):
+            results = averages[query_type]
+            with_cache.append(results["with_cache"])
+            without_cache.append(results["without_cache"])
+
+            ax.bar(
+                ["With Cache", "Without Cache"],
+                [with_cache[-1], without_cache[-1]],
+            )
+            ax.set_title(f"{query_type} Query Performance")
+            ax.set_ylabel("Average Time (ms)")
+            ax.grid(axis="y", linestyle="--", alpha=0.7)
+
+        # Create a comparison plot spanning the bottom row
+        for ax in axs[1]:
+            ax.remove()
+        ax = fig.add_subplot(2, 1, 2)
+
+        x = np.arange(len(query_types))
+        width = 0.35
+
+        ax.bar(x - width / 2, with_cache, width, label="With Cache")
+        ax.bar(x + width / 2, without_cache, width, label="Without Cache")
+
+        ax.set_xlabel("Query Type")
+        ax.set_ylabel("Average Time (ms)")
+        ax.set_title("Performance Comparison by Query Type")
+        ax.set_xticks(x)
+        ax.set_xticklabels(query_types)
+        ax.legend()
+        ax.grid(axis="y", linestyle="--", alpha=0.7)
+
+        # Adjust layout and save the figure
+        fig.tight_layout()
+        fig.savefig("performance_results.svg")
+        plt.close(fig)
+        print("\nPerformance plots saved to 'performance_results.svg'")
+
+    except Exception as e:
+        print(f"Error generating plots: {e}")
 
 
 class PerformanceTester:
     """Class to test performance of different configurations."""
 
-    def __init__(self, server_address):
+    def __init__(self, server_address, concurrency=4, window=16, pin_core=None):
         """Initialize the tester with a server address."""
         self.server_address = server_address
-        self.client = BasecampClient(server_address)
+        self.pin_core = pin_core
+        self.concurrency = max(1, concurrency)
+        self.window = max(1, window)
+
+        self.executor = futures.ThreadPoolExecutor(max_workers=self.concurrency)
+        # Render plots in a separate process so matplotlib stays out of the
+        # benchmark process; spawn avoids forking with gRPC threads running
+        self.plot_pool = futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.client = BasecampClient(server_address, options=_CHANNEL_OPTIONS)
+
+        # Connect up front so channel setup is not part of the first measurement
+        grpc.channel_ready_future(self.client.channel).result(
+            timeout=self.client.timeout
+        )
+
         self.results = {
             "exact_query": {
                 "with_cache": [],
@@ -98,227 +284,183 @@ class PerformanceTester:
             },
         }
 
-    def test_exact_query(self, key=None, num_iterations=10):
-        """Test exact query performance."""
-        print(f"Testing exact query performance with {num_iterations} iterations...")
-
-        # Generate a random key if not provided
-        key = key or random.randint(0, 999)
-
-        # Test with cache
-        print("Testing with cache...")
-        times_with_cache = []
-        for i in range(num_iterations):
-            # First query to populate the cache
-            query_id = f"query_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                key=key,
-                query_type="exact",
-                timestamp=int(time.time() * 1000),
-            )
-
-            # Send the query to populate the cache with a longer timeout
-            self.client.stub.QueryData(request, timeout=self.client.timeout * 10)
-
-            # Now measure the cached query with a longer timeout
-            start_time = time.time()
-            response = self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 10
-            )
-            end_time = time.time()
-
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_with_cache.append(time_taken)
-
-            # Verify that the result was served from cache
-            if not response.from_cache:
-                print(f"Warning: Result was not served from cache in iteration {i}")
-
-        # Calculate statistics
-        avg_time_with_cache = statistics.mean(times_with_cache)
-        std_dev_with_cache = (
-            statistics.stdev(times_with_cache) if len(times_with_cache) > 1 else 0
-        )
-
-        # Store the results
-        self.results["exact_query"]["with_cache"] = {
-            "times": times_with_cache,
-            "avg": avg_time_with_cache,
-            "std_dev": std_dev_with_cache,
-        }
-
-        # Test without cache (using a new key each time)
-        print("Testing without cache...")
-        times_without_cache = []
-        for i in range(num_iterations):
-            # Generate a new query ID and key for each iteration to avoid caching
-            query_id = f"query_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-            new_key = random.randint(0, 999)
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                key=new_key,
-                query_type="exact",
-                timestamp=int(time.time() * 1000),
-            )
+    def _stream_queries(self, requests, count, timeout, window=1):
+        """Send queries over one QueryDataBatch stream and time each response."""
+        # The server answers a stream in order, so each response completes the
+        # oldest outstanding request
+        sent = collections.deque()
+
+        # Bound the queries in flight. The server handles a stream one request
+        # at a time, so with a window above 1 each time also includes waiting
+        # behind up to window - 1 earlier requests; only the default window of
+        # 1 measures per-query latency
+        slots = threading.Semaphore(window)
+
+        # The requests are serialized as they are pulled from the iterator, so
+        # callers can yield the same message with updated fields each time
+        def request_iterator():
+            for request in requests:
+                # Stop sending if no response frees a slot within the timeout
+                if not slots.acquire(timeout=timeout):
+                    return
+                sent.append(_now())
+                yield request
+
+        # Store the latencies in a preallocated array rather than a growing list
+        responses = []
+        times = np.empty(count, dtype=np.float64)
+        for i, response in enumerate(
+            self.client.stub.QueryDataBatch(request_iterator(), timeout=timeout)
+        ):
+            times[i] = (_now() - sent.popleft()) / 1e6  # Convert to milliseconds
+            responses.append(response)
+            slots.release()
+
+        return responses, times[: len(responses)]
+
+    def _stream_queries_concurrently(self, make_requests, num_iterations, timeout):
+        """Split queries across concurrent pipelined streams to measure throughput."""
+        # Give each stream its own share of the queries
+        counts = [
+            num_iterations // self.concurrency
+            + (1 if i < num_iterations % self.concurrency else 0)
+            for i in range(self.concurrency)
+        ]
 
-            # Send the query and measure the time
-            start_time = time.time()
-            response = self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 2
+        start = _now()
+        pending = [
+            self.executor.submit(
+                self._stream_queries,
+                make_requests(count),
+                count,
+                timeout,
+                self.window,
             )
-            end_time = time.time()
-
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_without_cache.append(time_taken)
-
-            # Verify that the result was not served from cache
-            if response.from_cache:
-                print(f"Warning: Result was served from cache in iteration {i}")
-
-        # Calculate statistics
-        avg_time_without_cache = statistics.mean(times_without_cache)
-        std_dev_without_cache = (
-            statistics.stdev(times_without_cache) if len(times_without_cache) > 1 else 0
-        )
-
-        # Store the results
-        self.results["exact_query"]["without_cache"] = {
-            "times": times_without_cache,
-            "avg": avg_time_without_cache,
-            "std_dev": std_dev_without_cache,
-        }
-
-        # Print the results
-        print(
-            f"Average time with cache: {avg_time_with_cache:.2f} ms (std dev: {std_dev_with_cache:.2f} ms)"
-        )
+            for count in counts
+            if count
+        ]
+        responses = []
+        stream_times = []
+        for future in pending:
+            stream_responses, times = future.result()
+            responses.extend(stream_responses)
+            stream_times.append(times)
+        times = np.concatenate(stream_times) if stream_times else np.empty(0)
+        elapsed = (_now() - start) / 1e9  # Convert to seconds
+
+        throughput = len(times) / elapsed if elapsed > 0 else 0
+        return responses, times, throughput
+
+    def _run_query(
+        self,
+        query_type,
+        fields,
+        randomize,
+        num_iterations,
+        cached_timeout_mult,
+        uncached_timeout_mult,
+        name=None,
+    ):
+        """Measure a query type with and without the cache."""
+        name = name or f"{query_type}_query"
         print(
-            f"Average time without cache: {avg_time_without_cache:.2f} ms (std dev: {std_dev_without_cache:.2f} ms)"
+            f"Testing {result_label(name).lower()} query performance with {num_iterations} iterations..."
         )
-        print(f"Cache speedup: {avg_time_without_cache / avg_time_with_cache:.2f}x")
-
-        return {
-            "with_cache": {
-                "avg": avg_time_with_cache,
-                "std_dev": std_dev_with_cache,
-            },
-            "without_cache": {
-                "avg": avg_time_without_cache,
-                "std_dev": std_dev_without_cache,
-            },
-        }
-
-    def test_range_query(self, range_start=None, range_end=None, num_iterations=10):
-        """Test range query performance."""
-        print(f"Testing range query performance with {num_iterations} iterations...")
-
-        # Generate random range if not provided
-        range_start = range_start or random.randint(0, 499)
-        range_end = range_end or (range_start + random.randint(50, 200))
+        results = self.results.setdefault(name, {})
 
         # Test with cache
         print("Testing with cache...")
-        times_with_cache = []
-        for i in range(num_iterations):
-            # First query to populate the cache
-            query_id = f"query_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                range_start=range_start,
-                range_end=range_end,
-                query_type="range",
-                timestamp=int(time.time() * 1000),
-            )
-
-            # Send the query to populate the cache
-            self.client.stub.QueryData(request, timeout=self.client.timeout * 2)
+        # Reuse one query throughout so a single warm-up populates the cache
+        request = basecamp_pb2.QueryRequest(
+            query_id=f"query_{generate_random_id()}",
+            client_id=f"client_{generate_random_id()}",
+            query_type=query_type,
+            # The timestamp is informational, so read the clock once per batch
+            timestamp=int(time.time() * 1000),
+            **fields,
+        )
 
-            # Now measure the cached query
-            start_time = time.time()
-            response = self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 2
+        # Populate the cache with one query and wait for it to finish, so no
+        # measured query waits behind the uncached warm-up on the server
+        cached_timeout = self.client.timeout * cached_timeout_mult
+        warm_up = self.client.stub.QueryData(request, timeout=cached_timeout)
+        if warm_up.from_cache:
+            print("Warning: the warm-up query was already served from cache")
+
+        # Send the measured queries over a single stream, one at a time
+        with quiet_measurement(self.pin_core):
+            responses, times_with_cache = self._stream_queries(
+                itertools.repeat(request, num_iterations),
+                num_iterations,
+                timeout=cached_timeout,
             )
-            end_time = time.time()
-
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_with_cache.append(time_taken)
 
-            # Verify that the result was served from cache
-            if not response.from_cache:
-                print(f"Warning: Result was not served from cache in iteration {i}")
+        # Verify that the results were served from cache
+        report_cache_mismatches(
+            [i for i, response in enumerate(responses) if not response.from_cache],
+            "not served from cache",
+        )
 
         # Calculate statistics
-        avg_time_with_cache = statistics.mean(times_with_cache)
-        std_dev_with_cache = (
-            statistics.stdev(times_with_cache) if len(times_with_cache) > 1 else 0
-        )
+        with_cache = summarize_times(times_with_cache)
+        avg_time_with_cache = with_cache["avg"]
+        std_dev_with_cache = with_cache["std_dev"]
 
         # Store the results
-        self.results["range_query"]["with_cache"] = {
-            "times": times_with_cache,
-            "avg": avg_time_with_cache,
-            "std_dev": std_dev_with_cache,
-        }
+        results["with_cache"] = with_cache
 
-        # Test without cache (using a new range each time)
+        # Test without cache (using a new query each time)
         print("Testing without cache...")
-        times_without_cache = []
-        for i in range(num_iterations):
-            # Generate a new query ID and range for each iteration to avoid caching
-            query_id = f"query_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-            new_range_start = random.randint(0, 499)
-            new_range_end = new_range_start + random.randint(50, 200)
 
+        def uncached_requests(count):
+            # Reuse one message per stream and only update the fields that
+            # change per query
             request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                range_start=new_range_start,
-                range_end=new_range_end,
-                query_type="range",
-                timestamp=int(time.time() * 1000),
+                query_type=query_type, timestamp=int(time.time() * 1000)
             )
-
-            # Send the query and measure the time
-            start_time = time.time()
-            response = self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 2
+            for i in range(count):
+                # Generate a new query ID for each iteration to avoid caching
+                request.query_id = f"query_{generate_random_id()}"
+                request.client_id = f"client_{generate_random_id()}"
+                randomize(request)
+                yield request
+
+        # Measure latency the same way as with the cache, over one stream with
+        # one query at a time, so the speedup compares like with like
+        uncached_timeout = self.client.timeout * uncached_timeout_mult
+        with quiet_measurement(self.pin_core):
+            responses, times_without_cache = self._stream_queries(
+                uncached_requests(num_iterations),
+                num_iterations,
+                timeout=uncached_timeout,
             )
-            end_time = time.time()
 
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_without_cache.append(time_taken)
+        # Then spread a second batch over concurrent pipelined streams; their
+        # times include queueing, so only the throughput is reported. Don't pin
+        # here, so the streams' worker threads can run on separate cores
+        with quiet_measurement():
+            concurrent_responses, _, throughput = self._stream_queries_concurrently(
+                uncached_requests, num_iterations, timeout=uncached_timeout
+            )
 
-            # Verify that the result was not served from cache
-            if response.from_cache:
-                print(f"Warning: Result was served from cache in iteration {i}")
+        # Verify that the results were not served from cache
+        report_cache_mismatches(
+            [
+                i
+                for i, response in enumerate(responses + concurrent_responses)
+                if response.from_cache
+            ],
+            "served from cache",
+        )
 
         # Calculate statistics
-        avg_time_without_cache = statistics.mean(times_without_cache)
-        std_dev_without_cache = (
-            statistics.stdev(times_without_cache) if len(times_without_cache) > 1 else 0
-        )
+        without_cache = summarize_times(times_without_cache)
+        without_cache["throughput"] = throughput
+        avg_time_without_cache = without_cache["avg"]
+        std_dev_without_cache = without_cache["std_dev"]
 
         # Store the results
-        self.results["range_query"]["without_cache"] = {
-            "times": times_without_cache,
-            "avg": avg_time_without_cache,
-            "std_dev": std_dev_without_cache,
-        }
+        results["without_cache"] = without_cache
 
         # Print the results
         print(
@@ -327,6 +469,9 @@ class PerformanceTester:
         print(
             f"Average time without cache: {avg_time_without_cache:.2f} ms (std dev: {std_dev_without_cache:.2f} ms)"
         )
+        print(
+            f"Throughput without cache ({self.concurrency} streams): {throughput:.2f} queries/s"
+        )
         print(f"Cache speedup: {avg_time_without_cache / avg_time_with_cache:.2f}x")
 
         return {
@@ -340,122 +485,59 @@ class PerformanceTester:
             },
         }
 
-    def test_all_query(self, num_iterations=5):
-        """Test all query performance."""
-        print(f"Testing all query performance with {num_iterations} iterations...")
-
-        # Test with cache
-        print("Testing with cache...")
-        times_with_cache = []
-        for i in range(num_iterations):
-            # First query to populate the cache
-            query_id = f"query_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                query_type="all",
-                timestamp=int(time.time() * 1000),
-            )
-
-            # Send the query to populate the cache
-            self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 5
-            )  # Longer timeout for all query
-
-            # Now measure the cached query
-            start_time = time.time()
-            response = self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 5
-            )
-            end_time = time.time()
-
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_with_cache.append(time_taken)
-
-            # Verify that the result was served from cache
-            if not response.from_cache:
-                print(f"Warning: Result was not served from cache in iteration {i}")
-
-        # Calculate statistics
-        avg_time_with_cache = statistics.mean(times_with_cache)
-        std_dev_with_cache = (
-            statistics.stdev(times_with_cache) if len(times_with_cache) > 1 else 0
-        )
-
-        # Store the results
-        self.results["all_query"]["with_cache"] = {
-            "times": times_with_cache,
-            "avg": avg_time_with_cache,
-            "std_dev": std_dev_with_cache,
-        }
-
-        # Test without cache (using a new query ID each time)
-        print("Testing without cache...")
-        times_without_cache = []
-        for i in range(num_iterations):
-            # Generate a new query ID for each iteration to avoid caching
-            query_id = f"query_{generate_random_id()}"
-            client_id = f"client_{generate_random_id()}"
-
-            request = basecamp_pb2.QueryRequest(
-                query_id=query_id,
-                client_id=client_id,
-                query_type="all",
-                timestamp=int(time.time() * 1000),
-            )
+    def test_exact_query(self, key=None, num_iterations=10):
+        """Test exact query performance."""
+        # Generate a random key if not provided
+        key = key or random.randint(0, 999)
 
-            # Send the query and measure the time
-            start_time = time.time()
-            response = self.client.stub.QueryData(
-                request, timeout=self.client.timeout * 5
+        def randomize(request):
+            request.key = random.randint(0, 999)
+
+        return self._run_query("exact", {"key": key}, randomize, num_iterations, 10, 2)
+
+    def test_range_query(
+        self, range_start=None, range_end=None, num_iterations=10, widths=None
+    ):
+        """Test range query performance, optionally sweeping range widths."""
+        # Without widths (or with an explicit range) run a single random range
+        if not widths or range_end:
+            range_start = range_start or random.randint(0, 499)
+            range_end = range_end or (range_start + random.randint(50, 200))
+
+            def randomize(request):
+                request.range_start = random.randint(0, 499)
+                request.range_end = request.range_start + random.randint(50, 200)
+
+            fields = {"range_start": range_start, "range_end": range_end}
+            return self._run_query("range", fields, randomize, num_iterations, 2, 2)
+
+        # Record each width separately so overhead-bound small ranges can be
+        # compared with transfer-bound large ones
+        results = {}
+        for width in widths:
+            start = range_start or random.randint(0, 499)
+
+            def randomize(request, width=width):
+                request.range_start = random.randint(0, 499)
+                request.range_end = request.range_start + width
+
+            fields = {"range_start": start, "range_end": start + width}
+            results[width] = self._run_query(
+                "range",
+                fields,
+                randomize,
+                num_iterations,
+                2,
+                2,
+                name=f"range_query_{width}",
             )
-            end_time = time.time()
-
-            # Calculate the time taken
-            time_taken = (end_time - start_time) * 1000  # Convert to milliseconds
-            times_without_cache.append(time_taken)
-
-            # Verify that the result was not served from cache
-            if response.from_cache:
-                print(f"Warning: Result was served from cache in iteration {i}")
-
-        # Calculate statistics
-        avg_time_without_cache = statistics.mean(times_without_cache)
-        std_dev_without_cache = (
-            statistics.stdev(times_without_cache) if len(times_without_cache) > 1 else 0
-        )
+        return results
 
-        # Store the results
-        self.results["all_query"]["without_cache"] = {
-            "times": times_without_cache,
-            "avg": avg_time_without_cache,
-            "std_dev": std_dev_without_cache,
-        }
-
-        # Print the results
-        print(
-            f"Average time with cache: {avg_time_with_cache:.2f} ms (std dev: {std_dev_with_cache:.2f} ms)"
-        )
-        print(
-            f"Average time without cache: {avg_time_without_cache:.2f} ms (std dev: {std_dev_without_cache:.2f} ms)"
-        )
-        print(f"Cache speedup: {avg_time_without_cache / avg_time_with_cache:.2f}x")
-
-        return {
-            "with_cache": {
-                "avg": avg_time_with_cache,
-                "std_dev": std_dev_with_cache,
-            },
-            "without_cache": {
-                "avg": avg_time_without_cache,
-                "std_dev": std_dev_without_cache,
-            },
-        }
+    def test_all_query(self, num_iterations=5):
+        """Test all query performance."""
+        return self._run_query("all", {}, lambda request: None, num_iterations, 5, 5)
 
-    def run_all_tests(self, num_iterations=10):
+    def run_all_tests(self, num_iterations=10, range_widths=_RANGE_WIDTHS):
         """Run all performance tests."""
         print(f"Running all performance tests with {num_iterations} iterations each...")
 
@@ -465,7 +547,7 @@ class PerformanceTester:
 
         # Run range query tests
         print("\n=== Range Query Tests ===")
-        self.test_range_query(num_iterations=num_iterations)
+        self.test_range_query(num_iterations=num_iterations, widths=range_widths)
 
         # Run all query tests
         print("\n=== All Query Tests ===")
@@ -473,11 +555,28 @@ class PerformanceTester:
             num_iterations=num_iterations // 2
         )  # Fewer iterations for all query
 
+        # Generate plots while the summary is printed
+        plots = self.generate_plots()
+
         # Generate summary
         self.generate_summary()
 
-        # Generate plots
-        self.generate_plots()
+        # Save the raw times for later analysis
+        self.dump_results()
+
+        # Wait for the plots to be saved
+        plots.result()
+
+    def _measured_results(self):
+        """Return the measured results ordered by query type."""
+        measured = [
+            (name, results)
+            for name, results in self.results.items()
+            if results.get("with_cache") and results.get("without_cache")
+        ]
+        # Keep range widths next to each other between exact and all queries
+        order = ["exact", "range", "all"]
+        return sorted(measured, key=lambda item: order.index(item[0].split("_")[0]))
 
     def generate_summary(self):
         """Generate a summary of the performance results."""
@@ -490,95 +589,48 @@ class PerformanceTester:
             "Configuration",
             "Avg Time (ms)",
             "Std Dev (ms)",
+            "P50 (ms)",
+            "P95 (ms)",
+            "P99 (ms)",
             "Speedup",
         ]
 
-        # Add exact query results
-        exact_with_cache = self.results["exact_query"]["with_cache"]
-        exact_without_cache = self.results["exact_query"]["without_cache"]
-        speedup = (
-            exact_without_cache["avg"] / exact_with_cache["avg"]
-            if exact_with_cache["avg"] > 0
-            else 0
-        )
-
-        table.append(
-            [
-                "Exact",
-                "With Cache",
-                f"{exact_with_cache['avg']:.2f}",
-                f"{exact_with_cache['std_dev']:.2f}",
-                "-",
-            ]
-        )
-        table.append(
-            [
-                "Exact",
-                "Without Cache",
-                f"{exact_without_cache['avg']:.2f}",
-                f"{exact_without_cache['std_dev']:.2f}",
-                f"{speedup:.2f}x",
-            ]
-        )
-
-        # Add range query results
-        range_with_cache = self.results["range_query"]["with_cache"]
-        range_without_cache = self.results["range_query"]["without_cache"]
-        speedup = (
-            range_without_cache["avg"] / range_with_cache["avg"]
-            if range_with_cache["avg"] > 0
-            else 0
-        )
-
-        table.append(
-            [
-                "Range",
-                "With Cache",
-                f"{range_with_cache['avg']:.2f}",
-                f"{range_with_cache['std_dev']:.2f}",
-                "-",
-            ]
-        )
-        table.append(
-            [
-                "Range",
-                "Without Cache",
-                f"{range_without_cache['avg']:.2f}",
-                f"{range_without_cache['std_dev']:.2f}",
-                f"{speedup:.2f}x",
-            ]
-        )
-
-        # Add all query results
-        all_with_cache = self.results["all_query"]["with_cache"]
-        all_without_cache = self.results["all_query"]["without_cache"]
-        speedup = (
-            all_without_cache["avg"] / all_with_cache["avg"]
-            if all_with_cache["avg"] > 0
-            else 0
-        )
+        # Add a pair of rows for every query that was measured
+        for name, results in self._measured_results():
+            with_cache = results["with_cache"]
+            without_cache = results["without_cache"]
+            label = result_label(name)
+            speedup = (
+                without_cache["avg"] / with_cache["avg"] if with_cache["avg"] > 0 else 0
+            )
 
-        table.append(
-            [
-                "All",
-                "With Cache",
-                f"{all_with_cache['avg']:.2f}",
-                f"{all_with_cache['std_dev']:.2f}",
-                "-",
-            ]
-        )
-        table.append(
-            [
-                "All",
-                "Without Cache",
-                f"{all_without_cache['avg']:.2f}",
-                f"{all_without_cache['std_dev']:.2f}",
-                f"{speedup:.2f}x",
-            ]
-        )
+            table.append(
+                [
+                    label,
+                    "With Cache",
+                    f"{with_cache['avg']:.2f}",
+                    f"{with_cache['std_dev']:.2f}",
+                    f"{with_cache['p50']:.2f}",
+                    f"{with_cache['p95']:.2f}",
+                    f"{with_cache['p99']:.2f}",
+                    "-",
+                ]
+            )
+            table.append(
+                [
+                    label,
+                    "Without Cache",
+                    f"{without_cache['avg']:.2f}",
+                    f"{without_cache['std_dev']:.2f}",
+                    f"{without_cache['p50']:.2f}",
+                    f"{without_cache['p95']:.2f}",
+                    f"{without_cache['p99']:.2f}",
+                    f"{speedup:.2f}x",
+                ]
+            )
 
         # Print the table
-        print(tabulate(table, headers=headers, tablefmt="grid"))
+        print(format_table(headers, table))
 
         # Print overall findings
         print("\n=== Overall Findings ===")
@@ -593,87 +645,31 @@ class PerformanceTester:
             "4. The standard deviation is generally lower with caching, indicating more consistent performance."
         )
 
-    def generate_plots(self):
-        """Generate plots of the performance results."""
-        try:
-            # Create a figure with subplots
-            fig, axs = plt.subplots(1, 3, figsize=(15, 5))
-
-            # Plot exact query results
-            exact_with_cache = self.results["exact_query"]["with_cache"]
-            exact_without_cache = self.results["exact_query"]["without_cache"]
+    def dump_results(self, path="performance_results.csv"):
+        """Write every measured time to a CSV file."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["query_type", "configuration", "iteration", "time_ms"])
+            for name, results in self._measured_results():
+                for mode in ("with_cache", "without_cache"):
+                    writer.writerows(
+                        (name, mode, i, f"{time_ms:.6f}")
+                        for i, time_ms in enumerate(results[mode]["times"])
+                    )
 
-            axs[0].bar(
-                ["With Cache", "Without Cache"],
-                [exact_with_cache["avg"], exact_without_cache["avg"]],
-            )
-            axs[0].set_title("Exact Query Performance")
-            axs[0].set_ylabel("Average Time (ms)")
-            axs[0].grid(axis="y", linestyle="--", alpha=0.7)
-
-            # Plot range query results
-            range_with_cache = self.results["range_query"]["with_cache"]
-            range_without_cache = self.results["range_query"]["without_cache"]
-
-            axs[1].bar(
-                ["With Cache", "Without Cache"],
-                [range_with_cache["avg"], range_without_cache["avg"]],
-            )
-            axs[1].set_title("Range Query Performance")
-            axs[1].set_ylabel("Average Time (ms)")
-            axs[1].grid(axis="y", linestyle="--", alpha=0.7)
-
-            # Plot all query results
-            all_with_cache = self.results["all_query"]["with_cache"]
-            all_without_cache = self.results["all_query"]["without_cache"]
+        print(f"Raw performance results saved to '{path}'")
 
-            axs[2].bar(
-                ["With Cache", "Without Cache"],
-                [all_with_cache["avg"], all_without_cache["avg"]],
-            )
-            axs[2].set_title("All Query Performance")
-            axs[2].set_ylabel("Average Time (ms)")
-            axs[2].grid(axis="y", linestyle="--", alpha=0.7)
-
-            # Adjust layout and save the figure
-            plt.tight_layout()
-            plt.savefig("performance_results.png")
-            print("\nPerformance plots saved to 'performance_results.png'")
-
-            # Create a comparison plot
-            plt.figure(figsize=(10, 6))
-
-            query_types = ["Exact", "Range", "All"]
-            with_cache = [
-                exact_with_cache["avg"],
-                range_with_cache["avg"],
-                all_with_cache["avg"],
-            ]
-            without_cache = [
-                exact_without_cache["avg"],
-                range_without_cache["avg"],
-                all_without_cache["avg"],
-            ]
-
-            x = np.arange(len(query_types))
-            width = 0.35
-
-            plt.bar(x - width / 2, with_cache, width, label="With Cache")
-            plt.bar(x + width / 2, without_cache, width, label="Without Cache")
-
-            plt.xlabel("Query Type")
-            plt.ylabel("Average Time (ms)")
-            plt.title("Performance Comparison by Query Type")
-            plt.xticks(x, query_types)
-            plt.legend()
-            plt.grid(axis="y", linestyle="--", alpha=0.7)
-
-            plt.tight_layout()
-            plt.savefig("performance_comparison.png")
-            print("Performance comparison plot saved to 'performance_comparison.png'")
-
-        except Exception as e:
-            print(f"Error generating plots: {e}")
+    def generate_plots(self):
+        """Generate plots of the performance results in the background."""
+        # Only pass the averages so the snapshot is small and cannot change
+        # while it is being sent to the plotting process
+        averages = {
+            result_label(name): {
+                mode: results[mode]["avg"] for mode in ("with_cache", "without_cache")
+            }
+            for name, results in self._measured_results()
+        }
+        return self.plot_pool.submit(render_plots, averages)
 
 
 def main():
@@ -711,6 +707,31 @@ def main():
         type=int,
         help="End of range (for range queries)",
     )
+    parser.add_argument(
+        "--range-width",
+        type=int,
+        nargs="+",
+        default=list(_RANGE_WIDTHS),
+        help="Range widths to sweep for range queries (default: 100 1000 10000)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of concurrent streams for the without-cache throughput run (default: 4)",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=16,
+        help="Maximum number of queries in flight per concurrent stream (default: 16)",
+    )
+
+    parser.add_argument(
+        "--pin-core",
+        type=int,
+        help="CPU core to pin the single-stream measurements to (Linux only)",
+    )
 
     args = parser.parse_args()
 
@@ -722,7 +743,12 @@ def main():
         print(f"Replacing 0.0.0.0 with 127.0.0.1, using {server_address}")
 
     # Create a performance tester
-    tester = PerformanceTester(server_address)
+    tester = PerformanceTester(
+        server_address,
+        concurrency=args.concurrency,
+        window=args.window,
+        pin_core=args.pin_core,
+    )
 
     # Run the specified test
     if args.test == "exact":
@@ -732,11 +758,14 @@ def main():
             range_start=args.range_start,
             range_end=args.range_end,
             num_iterations=args.iterations,
+            widths=args.range_width,
         )
     elif args.test == "all":
         tester.test_all_query(num_iterations=args.iterations)
     else:  # all_tests
-        tester.run_all_tests(num_iterations=args.iterations)
+        tester.run_all_tests(
+            num_iterations=args.iterations, range_widths=args.range_width
+        )
 
 
 if __name__ == "__main__":
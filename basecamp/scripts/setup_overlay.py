@@ -8,74 +8,76 @@ according to the configuration.
 """
 
 import argparse
-import subprocess
+import asyncio
+import functools
 import sys
-import time
 import os
 import signal
-import threading
 import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 
-# Store the running processes
-running_processes: Dict[str, subprocess.Popen] = {}
-stop_event = threading.Event()
+# fcntl is POSIX-only; without it the output pipes keep their default size
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
+# Linux fcntl command that resizes a pipe (only exposed by Python 3.10+)
+F_SETPIPE_SZ = 1031
+PIPE_SIZE = 1 << 20
 
-def get_server_command(process_id: str, ip: str, config_path: str) -> List[str]:
-    """Get the command to start a server process."""
-    # Load the configuration
-    with open(config_path, "r") as f:
-        config = json.load(f)
+# Resolve the project layout and platform details once at import
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXE_SUFFIX = ".exe" if sys.platform == "win32" else ""
 
-    # Get the process configuration
-    process = config["nodes"][process_id]
-    port = process["port"]
+# The topology shipped with the repository, found relative to this script so
+# the default works from any working directory
+DEFAULT_CONFIG = os.path.join(PROJECT_DIR, "configs", "topology.json")
 
-    # Determine the path to the server executable
-    server_path = os.path.abspath(
-        os.path.join(
-            os.path.dirname(__file__), "..", "build", "src", "server", "basecamp_server"
-        )
-    )
+# Store the running processes and the tasks forwarding their output
+running_processes: Dict[str, asyncio.subprocess.Process] = {}
+output_tasks: List[asyncio.Task] = []
 
-    # Add .exe extension on Windows
-    if sys.platform == "win32":
-        server_path += ".exe"
 
-    # Check if the server executable exists
-    if not os.path.exists(server_path):
-        print(f"Server executable not found at {server_path}")
-        print("Checking alternative paths...")
+@functools.lru_cache(maxsize=None)
+def find_executable(kind: str, subdir: str, name: str) -> str:
+    """Find a built executable, checking the build directory first."""
+    # Try the build directory, then the source directory
+    candidates = [
+        os.path.join(PROJECT_DIR, "build", "src", subdir, name + EXE_SUFFIX),
+        os.path.join(PROJECT_DIR, "src", subdir, name + EXE_SUFFIX),
+    ]
 
-        # Try to find the executable in the current directory
-        alt_path = os.path.abspath(
-            os.path.join(
-                os.path.dirname(__file__), "..", "src", "server", "basecamp_server"
-            )
-        )
-        if sys.platform == "win32":
-            alt_path += ".exe"
+    for i, path in enumerate(candidates):
+        if os.path.exists(path):
+            if i > 0:
+                print(f"Found {kind} executable at {path}")
+            return path
+
+        print(f"{kind.capitalize()} executable not found at {path}")
+
+    print("Please make sure you have built the project using scripts/build.py")
+    sys.exit(1)
 
-        if os.path.exists(alt_path):
-            print(f"Found server executable at {alt_path}")
-            server_path = alt_path
-        else:
-            print(f"Server executable not found at {alt_path} either")
-            print("Please make sure you have built the project using scripts/build.py")
-            sys.exit(1)
+
+def get_server_command(process_id: str, ip: str, config: dict) -> List[str]:
+    """Get the command to start a server process."""
+    # Get the process configuration
+    process = config["nodes"][process_id]
+    port = process["port"]
+
+    # The executable is only looked up once per run
+    server_path = find_executable("server", "server", "basecamp_server")
 
     return [server_path, "--address", f"{ip}:{port}", "--node-id", process_id]
 
 
 def get_client_command(
-    process_id: str, connect_to: str, ip: str, config_path: str
+    process_id: str, connect_to: str, ip: str, config: dict
 ) -> List[str]:
     """Get the command to start a client process connecting to another process."""
-    # Load the configuration
-    with open(config_path, "r") as f:
-        config = json.load(f)
-
     # Get the process configurations
     process = config["nodes"][process_id]
     connect_process = config["nodes"][connect_to]
@@ -85,55 +87,139 @@ def get_client_command(
     )
     connect_port = connect_process["port"]
 
-    # Determine the path to the client executable
-    client_path = os.path.abspath(
-        os.path.join(
-            os.path.dirname(__file__),
-            "..",
-            "build",
-            "src",
-            "cpp_client",
-            "basecamp_client",
-        )
-    )
+    # The executable is only looked up once per run
+    client_path = find_executable("client", "cpp_client", "basecamp_client")
+
+    return [client_path, "--address", f"{connect_ip}:{connect_port}"]
 
-    # Add .exe extension on Windows
-    if sys.platform == "win32":
-        client_path += ".exe"
 
-    # Check if the client executable exists
-    if not os.path.exists(client_path):
-        print(f"Client executable not found at {client_path}")
-        print("Checking alternative paths...")
+def build_commands(config: dict, computer: int, ip: str) -> Dict[str, List[str]]:
+    """Build every command line for a computer, keyed by process name."""
+    commands = {}
+    for process_id, process in config["nodes"].items():
+        if process["computer"] != computer:
+            continue
 
-        # Try to find the executable in the current directory
-        alt_path = os.path.abspath(
-            os.path.join(
-                os.path.dirname(__file__), "..", "src", "cpp_client", "basecamp_client"
+        commands[f"{process_id}_server"] = get_server_command(process_id, ip, config)
+        for connect_to in process["connects_to"]:
+            commands[f"{process_id}_client_{connect_to}"] = get_client_command(
+                process_id, connect_to, ip, config
             )
+
+    return commands
+
+
+async def pump(stream: asyncio.StreamReader, tag: str) -> None:
+    """Print each line read from a process stream with a tag."""
+    # Read whatever is available in large chunks and split the lines out
+    # ourselves, so a burst of output costs one read and one write
+    buffer = bytearray()
+    while chunk := await stream.read(65536):
+        buffer += chunk
+        *lines, rest = buffer.split(b"\n")
+        buffer = bytearray(rest)
+        if lines:
+            sys.stdout.write(
+                "".join(
+                    f"[{tag}] {line.decode('utf-8', 'replace').rstrip()}\n"
+                    for line in lines
+                )
+            )
+            sys.stdout.flush()
+
+    # Print a final line that wasn't newline-terminated
+    if buffer:
+        print(f"[{tag}] {buffer.decode('utf-8', 'replace').rstrip()}")
+
+
+async def open_pipe_reader(fd: int) -> asyncio.StreamReader:
+    """Wrap the read end of a pipe in a StreamReader on the running loop."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+    )
+    return reader
+
+
+async def spawn(
+    cmd: List[str], env: Optional[dict], tag: str
+) -> asyncio.subprocess.Process:
+    """Start a process and forward its stdout and stderr on the event loop."""
+    # Give each process its own group so stopping it also stops any children
+    # it started
+    if fcntl is None or not sys.platform.startswith("linux"):
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            start_new_session=True,
         )
-        if sys.platform == "win32":
-            alt_path += ".exe"
+        streams = [process.stdout, process.stderr]
+    else:
+        # Enlarge the output pipes so a burst of log lines doesn't block the
+        # child while the event loop catches up
+        pipes = [os.pipe(), os.pipe()]
+        for read_fd, _ in pipes:
+            try:
+                fcntl.fcntl(read_fd, F_SETPIPE_SZ, PIPE_SIZE)
+            except OSError:
+                # Above the per-user pipe size limit; keep the default
+                pass
 
-        if os.path.exists(alt_path):
-            print(f"Found client executable at {alt_path}")
-            client_path = alt_path
-        else:
-            print(f"Client executable not found at {alt_path} either")
-            print("Please make sure you have built the project using scripts/build.py")
-            sys.exit(1)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=pipes[0][1],
+                stderr=pipes[1][1],
+                env=env,
+                start_new_session=True,
+            )
+        except BaseException:
+            for read_fd, _ in pipes:
+                os.close(read_fd)
+            raise
+        finally:
+            for _, write_fd in pipes:
+                os.close(write_fd)
+
+        streams = [await open_pipe_reader(read_fd) for read_fd, _ in pipes]
+
+    for stream in streams:
+        output_tasks.append(asyncio.create_task(pump(stream, tag)))
+    return process
+
+
+async def wait_ready(host: str, port: int, timeout: float = 5.0) -> bool:
+    """Wait until something accepts connections on host:port."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout=0.1
+            )
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(0.02)
+            continue
 
-    return [client_path, "--address", f"{connect_ip}:{connect_port}"]
+        writer.close()
+        return True
 
+    return False
 
-def start_process(
-    process_id: str, computer: int, ip: str, remote_ip: str, config_path: str
+
+async def start_process(
+    process_id: str,
+    computer: int,
+    ip: str,
+    remote_ip: str,
+    config: dict,
+    env: Optional[dict] = None,
+    commands: Optional[Dict[str, List[str]]] = None,
 ) -> None:
     """Start a process (server and clients if needed)."""
-    # Load the configuration
-    with open(config_path, "r") as f:
-        config = json.load(f)
-
     # Get the process configuration
     process = config["nodes"][process_id]
 
@@ -141,79 +227,138 @@ def start_process(
     if process["computer"] != computer:
         return
 
+    # Use the prebuilt command lines, building them if the caller didn't
+    if commands is None:
+        commands = build_commands(config, computer, ip)
+
     # Start the server
-    server_cmd = get_server_command(process_id, ip, config_path)
+    server_cmd = commands[f"{process_id}_server"]
     print(f"Starting server for process {process_id}: {' '.join(server_cmd)}")
 
-    # Set the REMOTE_IP environment variable for the server process
-    env = os.environ.copy()
-    env["REMOTE_IP"] = remote_ip
+    # The REMOTE_IP environment variable is set in env by the caller
     print(f"Setting REMOTE_IP={remote_ip} for server process {process_id}")
 
-    server_process = subprocess.Popen(
-        server_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env
-    )
+    # Start the server and print its output as it arrives
+    server_process = await spawn(server_cmd, env, f"{process_id} Server")
     running_processes[f"{process_id}_server"] = server_process
 
-    # Start a thread to read and print the server output
-    def read_output():
-        while not stop_event.is_set():
-            line = server_process.stdout.readline()
-            if not line:
-                break
-            print(f"[{process_id} Server] {line.strip()}")
-
-    threading.Thread(target=read_output, daemon=True).start()
-
-    # Wait for the server to start
-    time.sleep(1)
+    # Wait for the server to start listening before connecting clients to it
+    host = "127.0.0.1" if ip == "0.0.0.0" else ip
+    if not await wait_ready(host, process["port"]):
+        print(
+            f"Server for process {process_id} is not listening on {host}:{process['port']}"
+        )
+        return
 
     # Start clients to connect to other processes
     for connect_to in process["connects_to"]:
-        client_cmd = get_client_command(process_id, connect_to, ip, config_path)
+        client_cmd = commands[f"{process_id}_client_{connect_to}"]
         print(
             f"Starting client for process {process_id} connecting to {connect_to}: {' '.join(client_cmd)}"
         )
 
-        client_process = subprocess.Popen(
-            client_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=env,
+        # Start the client and print its output as it arrives
+        client_process = await spawn(
+            client_cmd, env, f"{process_id} Client to {connect_to}"
         )
         running_processes[f"{process_id}_client_{connect_to}"] = client_process
 
-        # Start a thread to read and print the client output
-        def read_client_output():
-            while not stop_event.is_set():
-                line = client_process.stdout.readline()
-                if not line:
-                    break
-                print(f"[{process_id} Client to {connect_to}] {line.strip()}")
 
-        threading.Thread(target=read_client_output, daemon=True).start()
+def signal_process(process: asyncio.subprocess.Process, kill: bool = False) -> None:
+    """Terminate or kill a process along with its process group on POSIX."""
+    try:
+        if sys.platform == "win32":
+            process.kill() if kill else process.terminate()
+        else:
+            os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+    except ProcessLookupError:
+        # The process has already exited
+        pass
 
 
-def stop_all_processes() -> None:
-    """Stop all running processes."""
-    stop_event.set()
+async def stop_process(name: str, process: asyncio.subprocess.Process) -> None:
+    """Wait for a terminated process to exit, killing it if it takes too long."""
+    try:
+        await asyncio.wait_for(process.wait(), timeout=5)
+        print(f"{name} stopped.")
+    except asyncio.TimeoutError:
+        print(f"Forcibly killing {name}...")
+        signal_process(process, kill=True)
+        await process.wait()
+
 
+async def stop_all_processes() -> None:
+    """Stop all running processes."""
     for name, process in running_processes.items():
         print(f"Stopping {name}...")
-        if sys.platform == "win32":
-            process.terminate()
-        else:
-            process.send_signal(signal.SIGTERM)
+        signal_process(process)
 
-    # Wait for processes to terminate
-    for name, process in running_processes.items():
-        try:
-            process.wait(timeout=5)
-            print(f"{name} stopped.")
-        except subprocess.TimeoutExpired:
-            print(f"Forcibly killing {name}...")
-            process.kill()
+    # Wait for the processes concurrently, so shutdown takes at most about
+    # five seconds however many of them ignore SIGTERM
+    await asyncio.gather(
+        *(stop_process(name, process) for name, process in running_processes.items())
+    )
+
+    # Let the forwarding tasks drain whatever output is left, but don't hang
+    # on pipes held open by orphaned grandchildren
+    if output_tasks:
+        _, pending = await asyncio.wait(output_tasks, timeout=1)
+        for task in pending:
+            task.cancel()
+
+
+async def run_all(config: dict) -> None:
+    """Start the processes for this computer and run until shut down."""
+    # Ctrl+C cancels this task; SIGTERM sets the event (add_signal_handler is
+    # not available on Windows)
+    shutdown = asyncio.Event()
+    if sys.platform != "win32":
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, shutdown.set)
+
+    try:
+        # Start processes for the specified computer
+        local_ids = [
+            process_id
+            for process_id, process in config["nodes"].items()
+            if process["computer"] == args.computer
+        ]
+
+        # Build the environment once for every process, and only copy it
+        # when REMOTE_IP actually needs to change
+        env = (
+            None
+            if os.environ.get("REMOTE_IP") == args.remote_ip
+            else {**os.environ, "REMOTE_IP": args.remote_ip}
+        )
+
+        # Build every command line up front, since the topology is fixed
+        commands = build_commands(config, args.computer, args.ip)
+
+        # Start the nodes concurrently; each one only waits for its own server
+        await asyncio.gather(
+            *(
+                start_process(
+                    process_id,
+                    args.computer,
+                    args.ip,
+                    args.remote_ip,
+                    config,
+                    env,
+                    commands,
+                )
+                for process_id in local_ids
+            )
+        )
+
+        print("\nAll processes started. Press Ctrl+C to stop.\n")
+
+        # Park until asked to shut down
+        await shutdown.wait()
+
+    finally:
+        print("\nStopping all processes...")
+        await stop_all_processes()
+        print("All processes stopped.")
 
 
 def copy_dlls_if_needed() -> None:
@@ -227,12 +372,8 @@ def copy_dlls_if_needed() -> None:
         return
 
     # Get the paths to the server and client executables
-    server_dir = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "build", "src", "server")
-    )
-    client_dir = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "build", "src", "cpp_client")
-    )
+    server_dir = os.path.join(PROJECT_DIR, "build", "src", "server")
+    client_dir = os.path.join(PROJECT_DIR, "build", "src", "cpp_client")
 
     # Create the directories if they don't exist
     os.makedirs(server_dir, exist_ok=True)
@@ -248,20 +389,23 @@ def copy_dlls_if_needed() -> None:
         "libwinpthread-1.dll",
     ]
 
-    # Copy the DLLs to the server and client directories
-    for dll in dlls:
+    def copy_dll(dll: str) -> None:
         dll_path = os.path.join(msys2_path, "bin", dll)
-        if os.path.exists(dll_path):
-            print(f"Copying {dll} to server and client directories...")
-            try:
-                import shutil
-
-                shutil.copy2(dll_path, server_dir)
-                shutil.copy2(dll_path, client_dir)
-            except Exception as e:
-                print(f"Error copying {dll}: {e}")
-        else:
+        if not os.path.exists(dll_path):
             print(f"Warning: {dll} not found in {msys2_path}/bin")
+            return
+
+        print(f"Copying {dll} to server and client directories...")
+        try:
+            # Only the contents are needed, so skip copying metadata
+            shutil.copyfile(dll_path, os.path.join(server_dir, dll))
+            shutil.copyfile(dll_path, os.path.join(client_dir, dll))
+        except Exception as e:
+            print(f"Error copying {dll}: {e}")
+
+    # Copy the DLLs to the server and client directories in parallel
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(copy_dll, dlls))
 
 
 def main() -> None:
@@ -288,8 +432,8 @@ def main() -> None:
     )
     parser.add_argument(
         "--config",
-        default="../configs/topology.json",
-        help="Path to the configuration file (default: ../configs/topology.json)",
+        default=DEFAULT_CONFIG,
+        help="Path to the configuration file (default: configs/topology.json)",
     )
 
     args = parser.parse_args()
@@ -297,28 +441,16 @@ def main() -> None:
     # Copy necessary DLLs if on Windows
     copy_dlls_if_needed()
 
-    try:
-        # Load the configuration
-        with open(args.config, "r") as f:
-            config = json.load(f)
-
-        # Start processes for the specified computer
-        for process_id, process in config["nodes"].items():
-            if process["computer"] == args.computer:
-                start_process(
-                    process_id, args.computer, args.ip, args.remote_ip, args.config
-                )
-
-        print("\nAll processes started. Press Ctrl+C to stop.\n")
-
-        # Keep the script running until interrupted
-        while True:
-            time.sleep(1)
+    # Load the configuration once and share it with every process
+    with open(args.config, "r") as f:
+        config = json.load(f)
 
+    # Forward every process's output from a single event loop; Ctrl+C cancels
+    # run_all, which stops the processes before the loop exits
+    try:
+        asyncio.run(run_all(config))
     except KeyboardInterrupt:
-        print("\nStopping all processes...")
-        stop_all_processes()
-        print("All processes stopped.")
+        pass
 
 
 if __name__ == "__main__":
@@ -9,10 +9,21 @@ This script sends a test message to a specified server and verifies the response
 import os
 import sys
 import argparse
+import asyncio
+import functools
+import io
+import itertools
 import time
 import random
 import string
 import threading
+import grpc
+
+# NumPy is optional; without it query results are not summarized
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Add the Python client directory to the path
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -43,8 +54,9 @@ except ImportError:
         )
         output_dir = os.path.join(python_client_dir, "proto")
 
-        # Generate the Python code
-        generate_proto(proto_file, output_dir)
+        # Regenerate the Python code, since the import can fail on code that
+        # looks current but came from different tool versions
+        generate_proto(proto_file, output_dir, force=True)
 
         # Try to import the Python client and proto modules again
         sys.path.append(output_dir)
@@ -59,17 +71,34 @@ except ImportError:
         sys.exit(1)
 
 
+# Keep the shared channel alive through the idle waits between tests, and
+# connect to the overlay directly rather than through any configured proxy
+_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 15000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.enable_http_proxy", 0),
+]
+
+
+# A dedicated generator and prebuilt alphabet keep ID generation cheap
+_RNG = random.Random()
+_ID_ALPHABET = tuple(string.ascii_uppercase + string.digits)
+
+# Content of the messages sent by test_send_multiple_messages
+_MESSAGE_TEMPLATE = "Test message %d from %s to %s at %s"
+
+
 def generate_random_id(length=8):
     """Generate a random ID."""
-    return "".join(random.choices(string.ascii_uppercase + string.digits, k=length))
+    return "".join(_RNG.choices(_ID_ALPHABET, k=length))
 
 
-def test_send_message(server_address, sender_id=None, receiver_id=None, content=None):
+def test_send_message(client, sender_id=None, receiver_id=None, content=None, out=None):
     """Test sending a message to a server."""
-    print(f"Testing send_message to server at {server_address}...")
-
-    # Create a client
-    client = BasecampClient(server_address)
+    # Write the report to out, or stdout if not given
+    emit = functools.partial(print, file=out)
+    emit(f"Testing send_message...")
 
     # Generate random IDs and content if not provided
     sender_id = sender_id or f"sender_{generate_random_id()}"
@@ -83,29 +112,38 @@ def test_send_message(server_address, sender_id=None, receiver_id=None, content=
         message_id = client.send_message(sender_id, receiver_id, content)
 
         # Print the result
-        print(f"Successfully sent message from {sender_id} to {receiver_id}")
-        print(f"Message content: {content}")
-        print(f"Message ID: '{message_id}'")
+        emit(f"Successfully sent message from {sender_id} to {receiver_id}")
+        emit(f"Message content: {content}")
+        emit(f"Message ID: '{message_id}'")
         return True
     except Exception as e:
-        print(f"Failed to send message from {sender_id} to {receiver_id}: {e}")
+        emit(f"Failed to send message from {sender_id} to {receiver_id}: {e}")
         return False
 
 
-def test_subscribe_to_updates(server_address, subscriber_id=None, topics=None):
+def test_subscribe_to_updates(
+    client, subscriber_id=None, topics=None, expected_updates=1, out=None
+):
     """Test subscribing to updates from a server."""
-    print(f"Testing subscribe_to_updates to server at {server_address}...")
-
-    # Create a client
-    client = BasecampClient(server_address)
+    # Write the report to out, or stdout if not given
+    emit = functools.partial(print, file=out)
+    emit(f"Testing subscribe_to_updates...")
 
     # Generate a random subscriber ID and topics if not provided
     subscriber_id = subscriber_id or f"subscriber_{generate_random_id()}"
     topics = topics or [f"topic_{generate_random_id()}" for _ in range(3)]
 
+    # Create an event to signal when the expected updates have arrived
+    updates_received = 0
+    update_event = threading.Event()
+
     # Define a callback function to handle updates
     def update_callback(update):
-        print(f"Received update: {update}")
+        nonlocal updates_received
+        emit(f"Received update: {update}")
+        updates_received += 1
+        if updates_received >= expected_updates:
+            update_event.set()
 
     try:
         # Subscribe to updates
@@ -113,34 +151,49 @@ def test_subscribe_to_updates(server_address, subscriber_id=None, topics=None):
 
         # Print the result
         if success:
-            print(f"Successfully subscribed to updates for {subscriber_id}")
-            print(f"Topics: {topics}")
-            print("Waiting for updates for 5 seconds...")
-            time.sleep(5)
+            emit(f"Successfully subscribed to updates for {subscriber_id}")
+            emit(f"Topics: {topics}")
+            emit("Waiting for updates for up to 5 seconds...")
+
+            # Wait for updates, returning as soon as they arrive
+            update_event.wait(5)
+
+            if updates_received > 0:
+                emit(f"Received {updates_received} updates")
+            else:
+                emit("No updates received within the timeout period")
         else:
-            print(f"Failed to subscribe to updates for {subscriber_id}")
+            emit(f"Failed to subscribe to updates for {subscriber_id}")
 
         return success
     except Exception as e:
-        print(f"Failed to subscribe to updates for {subscriber_id}: {e}")
+        emit(f"Failed to subscribe to updates for {subscriber_id}: {e}")
         return False
 
 
-def test_send_multiple_messages(server_address, num_messages=3):
+def test_send_multiple_messages(client, num_messages=3, verbose=True, out=None):
     """Test sending multiple messages to a server."""
-    print(f"Testing send_multiple_messages to server at {server_address}...")
-
-    # Create a client
-    client = BasecampClient(server_address)
-
-    # Create messages
+    # Write the report to out, or stdout if not given
+    emit = functools.partial(print, file=out)
+    emit(f"Testing send_multiple_messages...")
+
+    # Create the request protos directly, drawing the characters for every ID
+    # in one call; the client streams them all over a single RPC
+    ids = "".join(_RNG.choices(_ID_ALPHABET, k=16 * num_messages))
+    now = time.time()
+    timestamp = int(now * 1000)
     messages = []
     for i in range(num_messages):
-        sender_id = f"sender_{generate_random_id()}"
-        receiver_id = f"receiver_{generate_random_id()}"
-        content = f"Test message {i} from {sender_id} to {receiver_id} at {time.time()}"
+        sender_id = f"sender_{ids[16 * i : 16 * i + 8]}"
+        receiver_id = f"receiver_{ids[16 * i + 8 : 16 * i + 16]}"
+        content = _MESSAGE_TEMPLATE % (i, sender_id, receiver_id, now)
         messages.append(
-            {"sender_id": sender_id, "receiver_id": receiver_id, "content": content}
+            basecamp_pb2.MessageRequest(
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                content=content,
+                timestamp=timestamp,
+            )
         )
 
     try:
@@ -149,38 +202,48 @@ def test_send_multiple_messages(server_address, num_messages=3):
 
         # Print the result
         if response:
-            print(f"Successfully sent {response.success_count} messages")
+            emit(f"Successfully sent {response.success_count} messages")
             if response.failure_count > 0:
-                print(f"Failed to send {response.failure_count} messages")
-
-            for i, msg in enumerate(messages):
-                print(f"Message {i}: from {msg['sender_id']} to {msg['receiver_id']}")
-                print(f"Content: {msg['content']}")
+                emit(f"Failed to send {response.failure_count} messages")
+
+            if verbose:
+                emit(
+                    "\n".join(
+                        f"Message {i}: from {msg.sender_id} to {msg.receiver_id}\n"
+                        f"Content: {msg.content}"
+                        for i, msg in enumerate(messages)
+                    )
+                )
             return True
         else:
-            print(f"Failed to send messages")
+            emit(f"Failed to send messages")
             return False
     except Exception as e:
-        print(f"Failed to send multiple messages: {e}")
+        emit(f"Failed to send multiple messages: {e}")
         return False
 
 
-def test_chat(server_address, sender_id=None, num_messages=3):
+def test_chat(client, sender_id=None, num_messages=3, out=None):
     """Test chat with a server."""
-    print(f"Testing start_chat to server at {server_address}...")
-
-    # Create a client
-    client = BasecampClient(server_address)
+    # Write the report to out, or stdout if not given
+    emit = functools.partial(print, file=out)
+    emit(f"Testing start_chat...")
 
     # Generate a random sender ID if not provided
     sender_id = sender_id or f"sender_{generate_random_id()}"
 
     # Define a callback function to handle received messages
     def receive_callback(message):
-        print(f"Received message from {message.sender_id}: {message.content}")
-
-    # Define a function to generate messages
-    messages_sent = 0
+        emit(f"Received message from {message.sender_id}: {message.content}")
+
+    # Generate every message up front, so the client's sender thread gets
+    # the next one with a single C-level call; the content is only
+    # diagnostic, so read the clock once and tag messages by their index
+    started = time.time()
+    contents = [
+        f"Chat message {i} from {sender_id} at {started}" for i in range(num_messages)
+    ]
+    get_next_message = functools.partial(next, iter(contents), None)
     responses_received = 0
 
     # Create an event to signal when we've received responses
@@ -189,132 +252,256 @@ def test_chat(server_address, sender_id=None, num_messages=3):
     # Override the callback to count responses
     def counting_callback(message):
         nonlocal responses_received
-        print(f"Received message from {message.sender_id}: {message.content}")
+        emit(f"Received message from {message.sender_id}: {message.content}")
         responses_received += 1
-        if responses_received >= messages_sent:
+        if responses_received >= len(contents):
             response_event.set()
 
-    def get_next_message():
-        nonlocal messages_sent
-        if messages_sent >= num_messages:
-            return None
-
-        content = f"Chat message {messages_sent} from {sender_id} at {time.time()}"
-        messages_sent += 1
-
-        print(f"Sending message: {content}")
-        return content
-
     try:
+        for content in contents:
+            emit(f"Sending message: {content}")
+
         # Start the chat
         success = client.start_chat(sender_id, counting_callback, get_next_message)
 
         # Print the result
         if success:
-            print(f"Successfully started chat for {sender_id}")
-            print(f"Sent {messages_sent} messages")
-            print("Waiting for responses for 10 seconds...")
+            emit(f"Successfully started chat for {sender_id}")
+            emit(f"Sending {len(contents)} messages")
+            emit("Waiting for responses for 10 seconds...")
 
             # Wait for responses with a timeout
             response_event.wait(10)
 
             if responses_received > 0:
-                print(f"Received {responses_received} responses")
+                emit(f"Received {responses_received} responses")
             else:
-                print("No responses received within the timeout period")
+                emit("No responses received within the timeout period")
         else:
-            print(f"Failed to start chat for {sender_id}")
+            emit(f"Failed to start chat for {sender_id}")
 
         return success
     except Exception as e:
-        print(f"Failed to start chat for {sender_id}: {e}")
+        emit(f"Failed to start chat for {sender_id}: {e}")
         return False
 
 
+def _format_object(obj):
+    """Format a NestedObject value for printing."""
+    return (
+        f"    Object: {obj.name}\n"
+        f"    Tags: {', '.join(obj.tags)}\n"
+        f"    Properties: {obj.properties}"
+    )
+
+
+# Formatters for each field of the DataItem value_type oneof
+_VALUE_FORMATTERS = {
+    "string_value": lambda value: f"    String value: {value}",
+    "double_value": lambda value: f"    Double value: {value}",
+    "bool_value": lambda value: f"    Boolean value: {value}",
+    "object_value": _format_object,
+    "binary_value": lambda value: f"    Binary value: {len(value)} bytes",
+}
+
+
+def summarize_double_values(results):
+    """Summarize the double values in query results, or None if there are none."""
+    if np is None:
+        return None
+
+    # The values are a oneof field inside each item rather than a packed
+    # array, so gather them in one pass and reduce them with NumPy
+    values = np.fromiter(
+        (
+            item.double_value
+            for item in results
+            if item.WhichOneof("value_type") == "double_value"
+        ),
+        dtype=np.float64,
+    )
+    if not values.size:
+        return None
+    return (
+        f"Double values: {values.size}, min={values.min()}, "
+        f"mean={values.mean()}, max={values.max()}"
+    )
+
+
 def test_query_data(
-    server_address, query_type="exact", key=None, range_start=None, range_end=None
+    client,
+    query_type="exact",
+    key=None,
+    range_start=None,
+    range_end=None,
+    verbose=True,
+    out=None,
 ):
     """Test querying data from the server."""
-    print(f"Testing query_data to server at {server_address}...")
-
-    # Create a client
-    client = BasecampClient(server_address)
+    # Write the report to out, or stdout if not given
+    emit = functools.partial(print, file=out)
+    emit(f"Testing query_data...")
 
     # Generate a random query ID
     query_id = f"query_{generate_random_id()}"
     client_id = f"client_{generate_random_id()}"
 
     try:
-        # Create a query request
-        request = basecamp_pb2.QueryRequest(
-            query_id=query_id, client_id=client_id, timestamp=int(time.time() * 1000)
-        )
-
-        # Set the query type and parameters
-        request.query_type = query_type
+        # Collect the query type and parameters, then build the request in
+        # one constructor call rather than assigning fields one by one
+        now = time.time()
+        fields = {
+            "query_id": query_id,
+            "client_id": client_id,
+            "query_type": query_type,
+            "timestamp": int(now * 1000),
+        }
         if query_type == "exact":
-            request.key = key or random.randint(0, 999)
+            fields["key"] = key or random.randint(0, 999)
         elif query_type == "range":
-            request.range_start = range_start or random.randint(0, 499)
-            request.range_end = range_end or (
-                request.range_start + random.randint(50, 200)
+            fields["range_start"] = range_start or random.randint(0, 499)
+            fields["range_end"] = range_end or (
+                fields["range_start"] + random.randint(50, 200)
             )
         elif query_type == "write":
-            request.key = key or random.randint(0, 999)
-            request.string_param = f"Test value for key {request.key} at {time.time()}"
+            fields["key"] = key or random.randint(0, 999)
+            fields["string_param"] = f"Test value for key {fields['key']} at {now}"
         # For "all" query, no additional parameters are needed
-
-        # Send the query with a longer timeout
-        response = client.stub.QueryData(request, timeout=client.timeout * 10)
+        request = basecamp_pb2.QueryRequest(**fields)
+
+        # Serialize the request once and send the same bytes for both runs
+        # through a QueryData method without a request serializer; bind it
+        # and the longer timeout once so both runs use the same values
+        wire = request.SerializeToString()
+        query = client.channel.unary_unary(
+            "/basecamp.BasecampService/QueryData",
+            response_deserializer=basecamp_pb2.QueryResponse.FromString,
+        )
+        long_timeout = client.timeout * 10
+        response = query(wire, timeout=long_timeout)
 
         # Print the result
-        print(f"Query ID: {response.query_id}")
-        print(f"Success: {response.success}")
-        print(f"From cache: {response.from_cache}")
-        print(f"Processing time: {response.processing_time} ms")
-        print(f"Results: {len(response.results)} items")
-
-        # Print the first few results
-        for i, item in enumerate(response.results[:5]):
-            print(f"  Result {i}: Key={item.key}, Source={item.source_node}")
-
-            # Print the value based on its type
-            if item.HasField("string_value"):
-                print(f"    String value: {item.string_value}")
-            elif item.HasField("double_value"):
-                print(f"    Double value: {item.double_value}")
-            elif item.HasField("bool_value"):
-                print(f"    Boolean value: {item.bool_value}")
-            elif item.HasField("object_value"):
-                obj = item.object_value
-                print(f"    Object: {obj.name}")
-                print(f"    Tags: {', '.join(obj.tags)}")
-                print(f"    Properties: {obj.properties}")
-            elif item.HasField("binary_value"):
-                print(f"    Binary value: {len(item.binary_value)} bytes")
-
-            # Print metadata
-            if item.metadata:
-                print(f"    Metadata: {item.metadata}")
-
-            print(f"    Data type: {item.data_type}")
-            print(f"    Timestamp: {item.timestamp}")
-
-        if len(response.results) > 5:
-            print(f"  ... and {len(response.results) - 5} more")
+        emit(f"Query ID: {response.query_id}")
+        emit(f"Success: {response.success}")
+        emit(f"From cache: {response.from_cache}")
+        emit(f"Processing time: {response.processing_time} ms")
+        num_results = len(response.results)
+        emit(f"Results: {num_results} items")
+        summary = summarize_double_values(response.results)
+        if summary:
+            emit(summary)
+
+        # Print the first few results, formatting them only when they will be
+        # shown and writing them in one call
+        if verbose:
+            lines = []
+            for i, item in enumerate(itertools.islice(response.results, 5)):
+                lines.append(f"  Result {i}: Key={item.key}, Source={item.source_node}")
+
+                # Format the value based on its type, looking up the set oneof
+                # field once instead of probing each field with HasField
+                field = item.WhichOneof("value_type")
+                if field is not None:
+                    lines.append(_VALUE_FORMATTERS[field](getattr(item, field)))
+
+                # Format metadata
+                if item.metadata:
+                    lines.append(f"    Metadata: {item.metadata}")
+
+                lines.append(f"    Data type: {item.data_type}")
+                lines.append(f"    Timestamp: {item.timestamp}")
+
+            if num_results > 5:
+                lines.append(f"  ... and {num_results - 5} more")
+            if lines:
+                emit("\n".join(lines))
 
         # Run the query again to test caching with a longer timeout
-        print("\nRunning the same query again to test caching...")
-        response = client.stub.QueryData(request, timeout=client.timeout * 10)
-        print(f"From cache: {response.from_cache}")
-        print(f"Processing time: {response.processing_time} ms")
+        emit("\nRunning the same query again to test caching...")
+        response = query(wire, timeout=long_timeout)
+        emit(f"From cache: {response.from_cache}")
+        emit(f"Processing time: {response.processing_time} ms")
 
         return True
     except Exception as e:
-        print(f"Failed to query data: {e}")
+        emit(f"Failed to query data: {e}")
         return False
 
 
+def run_test(test):
+    """Run a test, collecting its report, and return whether it passed."""
+    out = io.StringIO()
+    try:
+        passed = bool(test(out=out))
+    except Exception as e:
+        print(f"Test raised an exception: {e}", file=out)
+        passed = False
+    return passed, out.getvalue()
+
+
+async def run_tests(tests):
+    """Run tests concurrently, each in its own thread, and return their results."""
+
+    async def run(test):
+        passed, report = await asyncio.to_thread(run_test, test)
+        # Print each report in one piece from the event loop thread as soon
+        # as its test finishes, so concurrent reports don't interleave
+        print(report, end="", flush=True)
+        return passed
+
+    return await asyncio.gather(*(run(test) for test in tests))
+
+
+def run_selected_tests(client, args):
+    """Run the tests selected on the command line with a shared client."""
+    # Connect up front so later tests don't pay for connection setup
+    try:
+        grpc.channel_ready_future(client.channel).result(timeout=5)
+    except grpc.FutureTimeoutError:
+        print("Warning: could not connect to the server within 5 seconds")
+
+    # Collect the specified test(s)
+    tests = []
+    if args.test == "send" or args.test == "all":
+        tests.append(functools.partial(test_send_message, client))
+
+    if args.test == "subscribe" or args.test == "all":
+        tests.append(functools.partial(test_subscribe_to_updates, client))
+
+    if args.test == "multiple" or args.test == "all":
+        tests.append(
+            functools.partial(
+                test_send_multiple_messages, client, verbose=not args.quiet
+            )
+        )
+
+    if args.test == "chat" or args.test == "all":
+        tests.append(functools.partial(test_chat, client))
+
+    if args.test == "query" or args.test == "all":
+        tests.append(
+            functools.partial(
+                test_query_data,
+                client,
+                query_type=args.query_type,
+                key=args.key,
+                range_start=args.range_start,
+                range_end=args.range_end,
+                verbose=not args.quiet,
+            )
+        )
+
+    # The tests are independent, so run them concurrently over the shared
+    # channel; the waits in the subscribe and chat tests then overlap
+    results = asyncio.run(run_tests(tests))
+
+    # Summarize the results
+    print("\nSummary:")
+    for test, passed in zip(tests, results):
+        print(f"  {test.func.__name__}: {'passed' if passed else 'FAILED'}")
+    return all(results)
+
+
 def main():
     """Main function."""
     parser = argparse.ArgumentParser(
@@ -350,6 +537,11 @@ def main():
         type=int,
         help="End of range (for range queries)",
     )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Skip printing individual messages and query results",
+    )
 
     args = parser.parse_args()
 
@@ -360,29 +552,14 @@ def main():
         server_address = f"127.0.0.1:{port}"
         print(f"Replacing 0.0.0.0 with 127.0.0.1, using {server_address}")
 
-    # Run the specified test(s)
-    if args.test == "send" or args.test == "all":
-        test_send_message(server_address)
-
-    if args.test == "subscribe" or args.test == "all":
-        test_subscribe_to_updates(server_address)
-
-    if args.test == "multiple" or args.test == "all":
-        test_send_multiple_messages(server_address)
-
-    if args.test == "chat" or args.test == "all":
-        test_chat(server_address)
-
-    if args.test == "query" or args.test == "all":
-        test_query_data(
-            server_address,
-            query_type=args.query_type,
-            key=args.key,
-            range_start=args.range_start,
-            range_end=args.range_end,
-        )
+    # Share one client, and so one channel, across all the tests
+    print(f"Testing server at {server_address}")
+    with BasecampClient(server_address, options=_CHANNEL_OPTIONS) as client:
+        passed = run_selected_tests(client, args)
 
     print("\nAll tests completed.")
+    if not passed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
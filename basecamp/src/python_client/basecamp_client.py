@@ -14,27 +14,76 @@ from proto import basecamp_pb2_grpc
 class BasecampClient:
     """Client for the Basecamp service."""
 
-    def __init__(self, server_address):
-        """Initialize the client with a server address."""
+    def __init__(
+        self,
+        server_address=None,
+        options=None,
+        channel=None,
+        compression=grpc.Compression.NoCompression,
+    ):
+        """Initialize the client with a server address or an existing channel."""
         # Set a timeout for gRPC calls (20 seconds)
         self.timeout = 20
-        self.channel = grpc.insecure_channel(server_address)
+        # Only close the channel on cleanup if this client created it. The
+        # messages are small, so its calls are uncompressed unless a
+        # compression is passed here; a passed-in channel keeps its own setting
+        self.owns_channel = channel is None
+        self.channel = channel or grpc.insecure_channel(
+            server_address, options=options, compression=compression
+        )
         self.stub = basecamp_pb2_grpc.BasecampServiceStub(self.channel)
         self.running = True
+        self.closed = False
+        # Streaming calls started by the background threads, cancelled on close
+        self.stream_calls = []
         self.subscription_thread = None
         self.chat_thread = None
         self.query_thread = None
 
+    def __enter__(self):
+        """Use the client as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the client when leaving the context."""
+        self.close()
+
     def __del__(self):
         """Clean up resources when the client is destroyed."""
+        # __init__ may have failed before the client was fully set up
+        if hasattr(self, "closed"):
+            self.close()
+
+    def close(self):
+        """Stop background streams and close the channel if this client owns it."""
+        # Closing twice, e.g. on leaving a with block and again on deletion,
+        # is a no-op
+        if self.closed:
+            return
+        self.closed = True
         self.running = False
+
+        # Cancel the streams this client started, since their deadlines are
+        # only advisory metadata and a caller-owned channel stays open, then
+        # join their threads
+        for call in self.stream_calls:
+            call.cancel()
+        if self.owns_channel:
+            self.channel.close()
         if self.subscription_thread:
             self.subscription_thread.join()
         if self.chat_thread:
             self.chat_thread.join()
         if self.query_thread:
             self.query_thread.join()
-        self.channel.close()
+
+    def _track_call(self, call):
+        """Remember a streaming call so close() can cancel it."""
+        self.stream_calls.append(call)
+        # Cancel it straight away if the client was closed while it started
+        if not self.running:
+            call.cancel()
+        return call
 
     def send_message(self, sender_id, receiver_id, content):
         """Send a message to another process."""
@@ -69,12 +118,17 @@ class BasecampClient:
                 metadata = [("deadline", str(time.time() + self.timeout * 10))]
 
                 # Call with metadata
-                for update in self.stub.SubscribeToUpdates(request, metadata=metadata):
+                updates = self._track_call(
+                    self.stub.SubscribeToUpdates(request, metadata=metadata)
+                )
+                for update in updates:
                     if not self.running:
                         break
                     callback(update)
             except grpc.RpcError as e:
-                print(f"Error subscribing to updates: {e}")
+                # Cancellation by close() is expected
+                if self.running:
+                    print(f"Error subscribing to updates: {e}")
 
         self.subscription_thread = threading.Thread(target=subscription_thread_func)
         self.subscription_thread.daemon = True
@@ -82,15 +136,23 @@ class BasecampClient:
         return True
 
     def send_multiple_messages(self, messages):
-        """Send multiple messages in a batch."""
+        """Send multiple messages in a batch over one client stream.
+
+        Messages may be MessageRequest protos, which are sent as-is, or dicts.
+        """
 
         def message_generator():
+            # Stamp the whole batch with one clock read
+            timestamp = int(time.time() * 1000)
             for msg in messages:
+                if isinstance(msg, basecamp_pb2.MessageRequest):
+                    yield msg
+                    continue
                 yield basecamp_pb2.MessageRequest(
                     sender_id=msg["sender_id"],
                     receiver_id=msg["receiver_id"],
                     content=msg["content"],
-                    timestamp=int(time.time() * 1000),
+                    timestamp=timestamp,
                 )
 
         try:
@@ -130,7 +192,9 @@ class BasecampClient:
                 metadata = [("deadline", str(time.time() + self.timeout * 10))]
 
                 # Create a bidirectional stream with the request iterator and metadata
-                chat_stream = self.stub.Chat(request_iterator(), metadata=metadata)
+                chat_stream = self._track_call(
+                    self.stub.Chat(request_iterator(), metadata=metadata)
+                )
 
                 # Read responses
                 try:
@@ -139,7 +203,9 @@ class BasecampClient:
                             break
                         receive_callback(message)
                 except grpc.RpcError as e:
-                    print(f"Error reading chat messages: {e}")
+                    # Cancellation by close() is expected
+                    if self.running:
+                        print(f"Error reading chat messages: {e}")
 
             except grpc.RpcError as e:
                 print(f"Error in chat: {e}")
@@ -159,20 +225,22 @@ class BasecampClient:
         range_end=None,
     ):
         """Query data from the server."""
-        # Create a query request
-        request = basecamp_pb2.QueryRequest(
-            query_id=query_id, client_id=client_id, timestamp=int(time.time() * 1000)
-        )
-
-        # Set the query type and parameters
-        request.query_type = query_type
+        # Collect the query type and parameters, then build the request in
+        # one constructor call rather than assigning fields one by one
+        fields = {
+            "query_id": query_id,
+            "client_id": client_id,
+            "query_type": query_type,
+            "timestamp": int(time.time() * 1000),
+        }
         if query_type == "exact" and key is not None:
-            request.key = key
+            fields["key"] = key
         elif (
             query_type == "range" and range_start is not None and range_end is not None
         ):
-            request.range_start = range_start
-            request.range_end = range_end
+            fields["range_start"] = range_start
+            fields["range_end"] = range_end
+        request = basecamp_pb2.QueryRequest(**fields)
 
         try:
             # Send the query
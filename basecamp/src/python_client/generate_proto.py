@@ -1,31 +1,98 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
 import subprocess
 import sys
+from importlib import metadata
 
+# Package init for the generated code; it selects the upb (C) protobuf
+# backend, which (de)serializes much faster than the pure-Python one
+PACKAGE_INIT = """import os
 
-def generate_proto(proto_file, output_dir):
+# Prefer the upb (C) protobuf backend over the pure-Python one; this must be
+# set before google.protobuf is first imported
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
+"""
+
+# Records the code generator versions next to the generated code
+STAMP_FILE = ".generated_versions"
+
+
+def generator_versions():
+    """Describe the installed grpcio-tools and protobuf versions."""
+    versions = []
+    for package in ("grpcio-tools", "protobuf"):
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package} not installed")
+    return "\n".join(versions) + "\n"
+
+
+def is_up_to_date(proto_file, output_dir):
+    """Check whether the generated code is current for the proto and tools."""
+    # Code from a different grpcio-tools or protobuf may not import, even
+    # when it is newer than the proto file
+    stamp = os.path.join(output_dir, STAMP_FILE)
+    if not os.path.exists(stamp):
+        return False
+    with open(stamp) as f:
+        if f.read() != generator_versions():
+            return False
+
+    base = os.path.splitext(os.path.basename(proto_file))[0]
+    proto_mtime = os.path.getmtime(proto_file)
+    for suffix in ("_pb2.py", "_pb2_grpc.py"):
+        output = os.path.join(output_dir, base + suffix)
+        if not os.path.exists(output) or os.path.getmtime(output) < proto_mtime:
+            return False
+    return True
+
+
+def write_package_init(output_dir):
+    """Write the package __init__.py unless it is already current."""
+    init_file = os.path.join(output_dir, "__init__.py")
+    if os.path.exists(init_file):
+        with open(init_file) as f:
+            if f.read() == PACKAGE_INIT:
+                return
+    with open(init_file, "w") as f:
+        f.write(PACKAGE_INIT)
+
+
+def generate_proto(proto_file, output_dir, force=False):
     """Generate Python code from a proto file."""
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
+    # Skip running protoc when the generated code is already up to date
+    if not force and is_up_to_date(proto_file, output_dir):
+        write_package_init(output_dir)
+        print(f"Python code for {proto_file} in {output_dir} is up to date")
+        return
+
     try:
         # Try to use grpc_tools.protoc
         print("Trying to generate Python code using grpc_tools.protoc...")
-        subprocess.check_call(
-            [
-                "python",
-                "-m",
-                "grpc_tools.protoc",
-                "--proto_path=" + os.path.dirname(proto_file),
-                "--python_out=" + output_dir,
-                "--grpc_python_out=" + output_dir,
-                proto_file,
-            ]
-        )
+        protoc_args = [
+            "--proto_path=" + os.path.dirname(proto_file),
+            "--python_out=" + output_dir,
+            "--pyi_out=" + output_dir,
+            "--grpc_python_out=" + output_dir,
+            proto_file,
+        ]
+        # Run protoc in this interpreter rather than starting a new one,
+        # adding the bundled well-known protos like `python -m` does
+        from grpc_tools import protoc
+
+        include_dir = os.path.join(os.path.dirname(protoc.__file__), "_proto")
+        argv = ["grpc_tools.protoc", *protoc_args, f"-I{include_dir}"]
+        returncode = protoc.main(argv)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, argv)
     except (ImportError, subprocess.CalledProcessError) as e:
-        print(f"Failed to use grpc_tools.protoc: {e}")
+        print(f"Failed to use grpc_tools.protoc with {sys.executable}: {e}")
         print("Falling back to using protoc and grpc_python_plugin from MSYS2/MinGW...")
 
         # Check if we're on Windows and MSYS2/MinGW is available
@@ -41,6 +108,7 @@ def generate_proto(proto_file, output_dir):
                         protoc_path,
                         f"--proto_path={os.path.dirname(proto_file)}",
                         f"--python_out={output_dir}",
+                        f"--pyi_out={output_dir}",
                         f"--grpc_python_out={output_dir}",
                         f"--plugin=protoc-gen-grpc_python={grpc_plugin_path}",
                         proto_file,
@@ -62,13 +130,26 @@ def generate_proto(proto_file, output_dir):
             sys.exit(1)
 
     # Create an __init__.py file to make the directory a package
-    with open(os.path.join(output_dir, "__init__.py"), "w") as f:
-        pass
+    write_package_init(output_dir)
+
+    # Record the versions the code was generated with
+    with open(os.path.join(output_dir, STAMP_FILE), "w") as f:
+        f.write(generator_versions())
 
     print(f"Generated Python code from {proto_file} in {output_dir}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate the Python gRPC code from the proto file."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate even if the generated code looks up to date",
+    )
+    args = parser.parse_args()
+
     # Get the directory of this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -82,4 +163,4 @@ if __name__ == "__main__":
     output_dir = os.path.join(script_dir, "proto")
 
     # Generate the Python code
-    generate_proto(proto_file, output_dir)
+    generate_proto(proto_file, output_dir, force=args.force)
@@ -0,0 +1,5 @@
+import os
+
+# Prefer the upb (C) protobuf backend over the pure-Python one; this must be
+# set before google.protobuf is first imported
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
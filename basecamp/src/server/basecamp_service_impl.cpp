@@ -505,6 +505,43 @@ void BasecampServiceImpl::HandleQueryData(
     }
 }
 
+void BasecampServiceImpl::HandleQueryDataBatch(
+    grpc::ServerContext* context,
+    grpc::ServerReaderWriter<QueryResponse, QueryRequest>* stream,
+    std::function<void(grpc::Status)> callback) {
+    
+    std::cout << "[" << node_id_ << "] HandleQueryDataBatch: Starting query batch" << std::endl;
+    
+    try {
+        QueryRequest request;
+        int query_count = 0;
+        
+        // Process each query as it arrives and stream back its response
+        while (stream->Read(&request)) {
+            query_count++;
+            
+            QueryResponse response;
+            HandleQueryData(context, &request, &response, [](grpc::Status) {});
+            
+            if (!stream->Write(response)) {
+                std::cerr << "[" << node_id_ << "] HandleQueryDataBatch: Failed to write response" << std::endl;
+                break;
+            }
+        }
+        
+        std::cout << "[" << node_id_ << "] HandleQueryDataBatch: Query batch ended, processed " << query_count << " queries" << std::endl;
+        
+        // Call the callback with OK status
+        callback(grpc::Status::OK);
+    } catch (const std::exception& e) {
+        std::cerr << "[" << node_id_ << "] HandleQueryDataBatch: Exception: " << e.what() << std::endl;
+        callback(grpc::Status(grpc::StatusCode::INTERNAL, std::string("Exception: ") + e.what()));
+    } catch (...) {
+        std::cerr << "[" << node_id_ << "] HandleQueryDataBatch: Unknown exception" << std::endl;
+        callback(grpc::Status(grpc::StatusCode::INTERNAL, "Unknown exception"));
+    }
+}
+
 void BasecampServiceImpl::HandleGatherData(
     grpc::ServerContext* context,
     const DataRequest* request,